@@ -12,35 +12,28 @@ import sys
 
 import MetaTrader5 as mt5
 import pytz
-import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import pandas_ta as ta
 
-from datetime import datetime, timedelta
+from plotly.subplots import make_subplots
+
+from datetime import datetime
+from terminal.Extensions.AnalysisCache import AnalysisCache
 from terminal.Extensions.MT5Ext import MT5Ext
 from terminal.Extensions.Range import Range
 
 MT5Ext.initialize()
 
+# bars and backtest results are reused while the ticks, parameters and code are unchanged
+cache = AnalysisCache()
+
 from_date = datetime(2024, 6, 19, hour=6, tzinfo=pytz.utc)
 to_date = datetime(2024, 6, 20, tzinfo=pytz.utc)
 
-trades_list = None
+trades_list = MT5Ext.load_ticks("WINQ24", from_date, to_date, mt5.COPY_TICKS_TRADE)
 
-while from_date < to_date:
-    trades = mt5.copy_ticks_range(
-        "WINQ24", from_date, from_date.replace(hour=23), mt5.COPY_TICKS_TRADE
-    )
-    if mt5.last_error()[0] == mt5.RES_S_OK and len(trades.shape) == 1:
-        if trades_list is None:
-            trades_list = trades
-        else:
-            trades_list = np.append(trades_list, trades)
-    from_date += timedelta(days=1)
-    del trades
-    
-ohlc = MT5Ext.create_ohlc_from_ticks(trades_list, '10s')
+ohlc = cache("ohlc", MT5Ext.create_ohlc_from_ticks, trades_list, '10s')
 ohlc["volume"] = ohlc["real_volume"]
 
 # Create a Stratey
@@ -134,12 +127,26 @@ class TestStrategy(bt.Strategy):
                 self.order = self.sell()
 
 
-if __name__ == '__main__':
+class Values(bt.Analyzer):
+    # broker value after every bar, cached with the results to plot them later
+
+    def start(self):
+        self.values = []
+
+    def next(self):
+        self.values.append(
+            (self.strategy.datetime.datetime(), self.strategy.broker.getvalue()))
+
+    def get_analysis(self):
+        return self.values
+
+
+def backtest(ohlc, strategy, maperiod):
     # Create a cerebro entity
     cerebro = bt.Cerebro()
 
     # Add a strategy
-    cerebro.addstrategy(TestStrategy)
+    cerebro.addstrategy(strategy, maperiod=maperiod)
 
     # Add the Data Feed to Cerebro
     data = bt.feeds.PandasData(dataname=ohlc)
@@ -154,14 +161,81 @@ if __name__ == '__main__':
     # Set the commission
     cerebro.broker.setcommission(commission=0.0)
 
-    # Print out the starting conditions
-    print('Starting Portfolio Value: %.2f' % cerebro.broker.getvalue())
+    # Record what the plot needs
+    cerebro.addanalyzer(Values, _name='values')
+    cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
+
+    starting_value = cerebro.broker.getvalue()
 
     # Run over everything
-    cerebro.run()
+    analyzers = cerebro.run()[0].analyzers
+
+    return {
+        'starting_value': starting_value,
+        'final_value': cerebro.broker.getvalue(),
+        'values': analyzers.values.get_analysis(),
+        'transactions': dict(analyzers.transactions.get_analysis()),
+    }
+
+
+def plot(ohlc, metrics, maperiod):
+    figure = make_subplots(
+        rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3])
+
+    figure.add_trace(
+        go.Candlestick(
+            x=ohlc.index,
+            open=ohlc['open'],
+            high=ohlc['high'],
+            low=ohlc['low'],
+            close=ohlc['close'],
+            name='ohlc'),
+        row=1, col=1)
+    figure.add_trace(
+        go.Scatter(
+            x=ohlc.index,
+            y=ohlc['close'].rolling(maperiod).mean(),
+            name='sma %s' % maperiod),
+        row=1, col=1)
+
+    # transactions are [amount, price, sid, symbol, value] per bar
+    for name, side, marker in [('buy', 1, 'triangle-up'), ('sell', -1, 'triangle-down')]:
+        executed = [
+            (time, transaction[1])
+            for time, transactions in metrics['transactions'].items()
+            for transaction in transactions
+            if transaction[0] * side > 0
+        ]
+        if executed:
+            times, prices = zip(*executed)
+            figure.add_trace(
+                go.Scatter(
+                    x=times,
+                    y=prices,
+                    mode='markers',
+                    marker_symbol=marker,
+                    marker_size=10,
+                    name=name),
+                row=1, col=1)
+
+    if metrics['values']:
+        times, values = zip(*metrics['values'])
+        figure.add_trace(go.Scatter(x=times, y=values, name='value'), row=2, col=1)
+
+    figure.update_layout(xaxis_rangeslider_visible=False)
+    figure.show()
+
+
+if __name__ == '__main__':
+    maperiod = 50
+    metrics = cache(
+        "backtest", backtest, ohlc, strategy=TestStrategy, maperiod=maperiod)
+
+    # Print out the starting conditions
+    print('Starting Portfolio Value: %.2f' % metrics['starting_value'])
 
     # Print out the final result
-    print('Final Portfolio Value: %.2f' % cerebro.broker.getvalue())
+    print('Final Portfolio Value: %.2f' % metrics['final_value'])
 
-    # Plot the result
-    cerebro.plot()
\ No newline at end of file
+    # Plot the result, also when the backtest is cached
+    plot(ohlc, metrics, maperiod)
\ No newline at end of file
@@ -0,0 +1,504 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import google.protobuf.timestamp_pb2 as timestampProtos
+import google.protobuf.wrappers_pb2 as wrappersProtos
+import grpc
+import numpy as np
+
+import Contracts_pb2 as contractsProtos
+import MarketData_pb2 as marketDataProtos
+import MarketData_pb2_grpc as marketDataServices
+import OrderManagementSystem_pb2 as omsProtos
+import OrderManagementSystem_pb2_grpc as omsServices
+
+from terminal.Extensions.Backend import Backend
+from terminal.Extensions.Instrument import Instrument
+from terminal.Extensions.MT5Ext import MT5Ext
+from terminal.Extensions.Replay import TICK_DTYPE, Replay
+from terminal.MarketData import MarketData
+from terminal.OrderManagementSystem import OrderManagementSystem
+
+logger = logging.getLogger("app")
+
+SYMBOL = "WIN"
+DEFAULT_MIX = (
+    "GetSymbolTick=8,GetTicksRangeBytes=2,StreamTicksRangeBytes=2,"
+    "StreamRatesRange=2,SendOrder=4"
+)
+
+
+class CpuTimer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cpu = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, name, context=None):
+        start = time.thread_time()
+        try:
+            yield
+        finally:
+            elapsed = time.thread_time() - start
+            with self.lock:
+                self.cpu[name] += elapsed
+
+    def reset(self):
+        with self.lock:
+            cpu = dict(self.cpu)
+            self.cpu.clear()
+        return cpu
+
+
+def synthetic_ticks(days, ticks_per_day, seed=7):
+    rng = np.random.default_rng(seed)
+    day_ms = 9 * 3600 * 1000
+    start = int(datetime(2024, 6, 3, 12, tzinfo=timezone.utc).timestamp() * 1000)
+
+    chunks = []
+    for day in range(days):
+        offsets = np.sort(rng.integers(0, day_ms, ticks_per_day))
+        chunks.append(start + day * 86400 * 1000 + offsets)
+    time_msc = np.concatenate(chunks)
+
+    last = 130000 + 5 * np.cumsum(rng.integers(-1, 2, len(time_msc)))
+    ticks = np.zeros(len(time_msc), dtype=TICK_DTYPE)
+    ticks["time_msc"] = time_msc
+    ticks["time"] = time_msc // 1000
+    ticks["last"] = last
+    ticks["bid"] = last - 5
+    ticks["ask"] = last + 5
+    ticks["volume"] = rng.integers(1, 20, len(time_msc))
+    ticks["volume_real"] = ticks["volume"]
+    ticks["flags"] = np.where(
+        rng.random(len(time_msc)) < 0.6,
+        Replay.TICK_FLAG_LAST | Replay.TICK_FLAG_VOLUME,
+        Replay.TICK_FLAG_BID | Replay.TICK_FLAG_ASK,
+    )
+    return ticks
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+class PeakRss:
+    # high-water mark of one phase, linux resets VmHWM when "5" is written to
+    # clear_refs, elsewhere rss is sampled from a thread
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.cleared = False
+        self.peak = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        try:
+            with open("/proc/self/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+            self.cleared = True
+        except OSError:
+            self.cleared = False
+            self.peak = rss_mb()
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.__sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *_):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def __sample(self):
+        while not self.stopped.wait(self.interval):
+            rss = rss_mb()
+            if rss is not None:
+                self.peak = max(self.peak or 0.0, rss)
+
+    def mb(self):
+        if not self.cleared:
+            return self.peak
+        try:
+            with open("/proc/self/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 2**10
+        except (OSError, ValueError):
+            pass
+        return None
+
+
+def timestamp(msc):
+    value = timestampProtos.Timestamp()
+    value.FromMilliseconds(int(msc))
+    return value
+
+
+class Workload:
+
+    def __init__(self, channel, first_msc, last_msc, window_msc):
+        self.marketData = marketDataServices.MarketDataStub(channel)
+        self.oms = omsServices.OrderManagementSystemStub(channel)
+        self.first_msc = first_msc
+        self.last_msc = last_msc
+        self.window_msc = window_msc
+
+    def __window(self):
+        start = random.randint(
+            self.first_msc, max(self.first_msc, self.last_msc - self.window_msc)
+        )
+        return timestamp(start), timestamp(start + self.window_msc)
+
+    async def GetSymbolTick(self):
+        reply = await self.marketData.GetSymbolTick(
+            marketDataProtos.GetSymbolTickRequest(symbol=SYMBOL)
+        )
+        return reply.responseStatus.responseCode
+
+    async def GetTicksRangeBytes(self):
+        fromDate, toDate = self.__window()
+        reply = await self.marketData.GetTicksRangeBytes(
+            marketDataProtos.GetTicksRangeBytesRequest(
+                symbol=SYMBOL,
+                fromDate=fromDate,
+                toDate=toDate,
+                type=contractsProtos.COPY_TICKS_TRADE,
+                returnFields=["time_msc", "last", "volume_real"],
+            )
+        )
+        np.load(io.BytesIO(bytes(reply.bytes)))
+        return reply.responseStatus.responseCode
+
+    async def StreamTicksRangeBytes(self):
+        fromDate, toDate = self.__window()
+        code = contractsProtos.RES_S_OK
+        async for reply in self.marketData.StreamTicksRangeBytes(
+            marketDataProtos.StreamTicksRangeBytesRequest(
+                symbol=SYMBOL,
+                fromDate=fromDate,
+                toDate=toDate,
+                type=contractsProtos.COPY_TICKS_ALL,
+                chunkSize=64 * 1024,
+                returnFields=["time_msc", "bid", "ask", "last", "volume_real", "flags"],
+            )
+        ):
+            code = reply.responseStatus.responseCode
+        return code
+
+    async def StreamRatesRange(self):
+        code = contractsProtos.RES_S_OK
+        async for reply in self.marketData.StreamRatesRange(
+            marketDataProtos.StreamRatesRangeRequest(
+                symbol=SYMBOL,
+                fromDate=timestamp(self.first_msc),
+                toDate=timestamp(self.last_msc),
+                timeframe=contractsProtos.TIMEFRAME_M1,
+                chunkSize=1000,
+            )
+        ):
+            code = reply.responseStatus.responseCode
+        return code
+
+    async def SendOrder(self):
+        reply = await self.oms.SendOrder(
+            omsProtos.OrderRequest(
+                action=contractsProtos.TRADE_ACTION_DEAL,
+                symbol=wrappersProtos.StringValue(value=SYMBOL),
+                volume=wrappersProtos.DoubleValue(value=1),
+                type=random.choice(
+                    [contractsProtos.ORDER_TYPE_BUY, contractsProtos.ORDER_TYPE_SELL]
+                ),
+            )
+        )
+        return reply.responseStatus.responseCode
+
+
+async def subscribe_books(channel, subscribers, duration):
+    marketData = marketDataServices.MarketDataStub(channel)
+    latencies = []
+    sizes = []
+    errors = 0
+
+    async def subscriber():
+        nonlocal errors
+        call = marketData.SubscribeMarketBook(
+            marketDataProtos.SubscribeMarketBookRequest(symbol=SYMBOL, delta=True)
+        )
+        async for reply in call:
+            if reply.responseStatus.responseCode != contractsProtos.RES_S_OK:
+                errors += 1
+                continue
+            latencies.append(time.time() - reply.timeMsc / 1000)
+            sizes.append(reply.ByteSize())
+
+    tasks = [asyncio.create_task(subscriber()) for _ in range(subscribers)]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return latencies, errors, sizes
+
+
+async def drive(call, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                code = await call()
+            except grpc.RpcError:
+                code = None
+            latencies.append(time.perf_counter() - start)
+            if code != contractsProtos.RES_S_OK:
+                errors += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors
+
+
+def summarize(latencies, errors, elapsed, cpu, peak_rss):
+    latencies = np.asarray(latencies) * 1000
+    calls = len(latencies)
+    return {
+        "calls": calls,
+        "errors": errors,
+        "throughput": calls / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if calls else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if calls else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if calls else None,
+        "server_cpu_s": cpu,
+        "server_cpu_ms_per_call": cpu * 1000 / calls if calls else None,
+        "rss_mb": rss_mb(),
+        "peak_rss_mb": peak_rss,
+    }
+
+
+async def run(args, mix):
+    timer = CpuTimer()
+    marketData = MarketData(args.book_poll_interval)
+
+    server = grpc.aio.server()
+    marketDataServices.add_MarketDataServicer_to_server(
+        Instrument.wrap(marketData, timer), server
+    )
+    omsServices.add_OrderManagementSystemServicer_to_server(
+        Instrument.wrap(OrderManagementSystem(), timer), server
+    )
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+
+    replay = Backend.current()
+    results = {}
+
+    options = [
+        ("grpc.max_receive_message_length", 256 * 1024 * 1024),
+    ]
+    async with grpc.aio.insecure_channel(
+        f"127.0.0.1:{port}", options=options
+    ) as channel:
+        workload = Workload(
+            channel, replay.start_msc, replay.end_msc, args.window_minutes * 60 * 1000
+        )
+
+        phases = [(name, {name: concurrency}) for name, concurrency in mix.items()]
+        if len(mix) > 1:
+            phases.append(("mixed", mix))
+
+        for phase, calls in phases:
+            logger.info("running %s for %ss: %s", phase, args.duration, calls)
+            timer.reset()
+            started = time.perf_counter()
+            with PeakRss() as peak:
+                outcomes = await asyncio.gather(
+                    *[
+                        drive(getattr(workload, name), concurrency, args.duration)
+                        for name, concurrency in calls.items()
+                    ]
+                )
+            elapsed = time.perf_counter() - started
+            cpu = timer.reset()
+
+            if phase != "mixed":
+                results[phase] = summarize(
+                    *outcomes[0], elapsed, cpu.get(phase, 0.0), peak.mb()
+                )
+            else:
+                results[phase] = {
+                    name: summarize(*outcome, elapsed, cpu.get(name, 0.0), peak.mb())
+                    for name, outcome in zip(calls, outcomes)
+                }
+
+        if args.book_subscribers:
+            results["SubscribeMarketBook"] = {}
+
+        for subscribers in args.book_subscribers:
+            logger.info(
+                "running SubscribeMarketBook for %ss: %s subscribers",
+                args.duration,
+                subscribers,
+            )
+            polls = marketData.books.polls
+            # book streams run on the event loop, cpu is the whole process with clients
+            cpu = time.process_time()
+            started = time.perf_counter()
+            with PeakRss() as peak:
+                latencies, errors, sizes = await subscribe_books(
+                    channel, subscribers, args.duration
+                )
+            elapsed = time.perf_counter() - started
+
+            result = summarize(
+                latencies, errors, elapsed, time.process_time() - cpu, peak.mb()
+            )
+            result["updates_per_subscriber"] = len(latencies) / subscribers / elapsed
+            result["bytes_per_update"] = float(np.mean(sizes)) if sizes else None
+            result["terminal_polls"] = marketData.books.polls - polls
+            results["SubscribeMarketBook"][str(subscribers)] = result
+
+    await server.stop(None)
+    return results
+
+
+def compare(results, baseline, max_regression):
+    regressions = []
+
+    def rows(data, prefix=""):
+        for name, value in data.items():
+            if "p95_ms" in value:
+                yield prefix + name, value
+            else:
+                yield from rows(value, prefix + name + ".")
+
+    previous = dict(rows(baseline["results"]))
+    for name, current in rows(results):
+        before = previous.get(name)
+        if before is None or not before["p95_ms"] or not current["p95_ms"]:
+            continue
+
+        throughput = (
+            (current["throughput"] / before["throughput"] - 1) * 100
+            if before["throughput"]
+            else 0.0
+        )
+        p95 = (current["p95_ms"] / before["p95_ms"] - 1) * 100
+        print(f"{name:40} throughput {throughput:+7.1f}%  p95 {p95:+7.1f}%")
+
+        if max_regression is not None and p95 > max_regression:
+            regressions.append(name)
+
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="load and latency benchmark of the MarketData and "
+        "OrderManagementSystem RPCs"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="tick file replayed for the benchmark symbol, "
+        "synthetic ticks when omitted",
+    )
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--ticks-per-day", type=int, default=200000)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="RPC=concurrency list")
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="seconds per phase"
+    )
+    parser.add_argument("--window-minutes", type=int, default=60)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="simulated terminal latency"
+    )
+    parser.add_argument(
+        "--book-subscribers",
+        default="1,10,100",
+        help="SubscribeMarketBook subscriber counts, one phase each, empty to skip",
+    )
+    parser.add_argument("--book-poll-interval", type=float, default=0.1)
+    parser.add_argument("--output", default=None, help="JSON results file")
+    parser.add_argument("--compare", default=None, help="previous JSON results file")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=None,
+        help="exit with an error when any p95 grows by more than this percentage",
+    )
+    args = parser.parse_args()
+    args.book_subscribers = [
+        int(value) for value in args.book_subscribers.split(",") if value
+    ]
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s:%(name)s: %(message)s",
+        level=logging.INFO,
+        datefmt="%H:%M:%S",
+        stream=sys.stderr,
+    )
+
+    mix = {
+        name: int(concurrency)
+        for name, concurrency in (item.split("=") for item in args.mix.split(","))
+    }
+
+    source = args.replay or synthetic_ticks(args.days, args.ticks_per_day)
+    Backend.use(Replay({SYMBOL: source}, speed=0, latency=args.latency))
+    MT5Ext.initialize()
+
+    results = asyncio.run(run(args, mix))
+
+    report = {
+        "started": datetime.now(tz=timezone.utc).isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        "benchmarks", f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    logger.info("results saved to %s", output)
+
+    print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            logger.error("p95 regressions: %s", ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,206 @@
+import io
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import google.protobuf.timestamp_pb2 as timestampProtos
+import grpc
+import numpy as np
+import Contracts_pb2 as contractsProtos
+import MarketData_pb2 as protos
+import MarketData_pb2_grpc as services
+
+from terminal.Extensions.TickCodec import TickCodec
+
+logger = logging.getLogger("app")
+
+_FIELDS = ["time_msc", "bid", "ask", "last", "volume", "volume_real", "flags"]
+_CHUNK_SIZE = 1024 * 1024
+_TICKS_PER_PAYLOAD = 250000
+_MAX_MESSAGE_LENGTH = 64 * 1024 * 1024
+
+
+class ShardError(Exception):
+    pass
+
+
+class TicksRangeClient:
+
+    def __init__(self, addresses, concurrency=None, retries=3, backoff=0.5):
+        self.addresses = list(addresses)
+        self.concurrency = concurrency or len(self.addresses) * 2
+        self.retries = retries
+        self.backoff = backoff
+        self.channels = [
+            grpc.insecure_channel(
+                address,
+                options=[("grpc.max_receive_message_length", _MAX_MESSAGE_LENGTH)],
+            )
+            for address in self.addresses
+        ]
+        self.stubs = [services.MarketDataStub(channel) for channel in self.channels]
+
+    @staticmethod
+    def addresses_from(host, *portSettings):
+        # same "port+quantity" notation used by multiserver.py
+        addresses = []
+        for portSetting in portSettings:
+            value = str(portSetting).split("+")
+            port = int(value[0])
+            quantity = int(value[1]) if len(value) > 1 else 0
+            addresses += [f"{host}:{port + i}" for i in range(quantity + 1)]
+        return addresses
+
+    @staticmethod
+    def shards(from_date, to_date, shard=timedelta(days=1)):
+        shards = []
+        start = from_date
+        while start < to_date:
+            end = min(start + shard, to_date)
+            shards.append((start, end))
+            start = end
+        return shards
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __request(self, symbol, start, end, type, fields, compact):
+        fromDate = timestampProtos.Timestamp()
+        fromDate.FromDatetime(start)
+        toDate = timestampProtos.Timestamp()
+        toDate.FromDatetime(end)
+        return protos.StreamTicksRangeBytesRequest(
+            symbol=symbol,
+            fromDate=fromDate,
+            toDate=toDate,
+            type=type,
+            chunkSize=_CHUNK_SIZE,
+            ticksPerPayload=_TICKS_PER_PAYLOAD,
+            returnFields=fields,
+            encoding=(
+                contractsProtos.TICKS_ENCODING_COMPACT
+                if compact
+                else contractsProtos.TICKS_ENCODING_NPZ
+            ),
+        )
+
+    @staticmethod
+    def __columns(payload, fields, compact):
+        if compact:
+            data = TickCodec.loads(bytes(payload))
+            return {name: data[name] for name in fields}
+
+        with np.load(io.BytesIO(bytes(payload))) as npz:
+            return {name: npz[name] for name in fields}
+
+    def __fetch(self, index, symbol, start, end, last, type, fields, compact):
+        request = self.__request(symbol, start, end, type, fields, compact)
+        start_msc = int(start.timestamp() * 1000)
+        end_msc = int(end.timestamp() * 1000)
+        parts = []
+
+        for attempt in range(self.retries + 1):
+            stub = self.stubs[(index + attempt) % len(self.stubs)]
+            try:
+                # complete payloads are kept, a retry resumes after the last one
+                payload = bytearray()
+                for reply in stub.StreamTicksRangeBytes(request):
+                    code = reply.responseStatus.responseCode
+                    if code != contractsProtos.RES_S_OK:
+                        raise ShardError(
+                            f"{code}: {reply.responseStatus.responseMessage.value}"
+                        )
+                    payload += bytes(reply.bytes)
+
+                    if reply.continuationToken:
+                        parts.append(TicksRangeClient.__columns(payload, fields, compact))
+                        request.continuationToken = reply.continuationToken
+                        payload = bytearray()
+
+                if len(payload) > 0:
+                    # servers without continuation tokens send a single payload
+                    parts.append(TicksRangeClient.__columns(payload, fields, compact))
+
+                columns = {
+                    name: np.concatenate([part[name] for part in parts])
+                    for name in fields
+                }
+
+                # shards share their boundaries, keep [start, end) except on the last one
+                time_msc = columns["time_msc"]
+                mask = (time_msc >= start_msc) & (
+                    (time_msc <= end_msc) if last else (time_msc < end_msc)
+                )
+                logger.debug("shard %s %s..%s: %s ticks", index, start, end, mask.sum())
+                return {name: values[mask] for name, values in columns.items()}
+            except (grpc.RpcError, ShardError, ValueError, KeyError) as error:
+                if attempt == self.retries:
+                    raise ShardError(f"shard {start}..{end} failed: {error}") from error
+                logger.warning(
+                    "shard %s..%s attempt %s failed after %s payloads: %s",
+                    start,
+                    end,
+                    attempt + 1,
+                    len(parts),
+                    error,
+                )
+                time.sleep(self.backoff * 2**attempt)
+
+    def get_ticks_range(
+        self,
+        symbol,
+        from_date,
+        to_date,
+        type=contractsProtos.COPY_TICKS_ALL,
+        fields=None,
+        shard=timedelta(days=1),
+        compact=False,
+    ):
+        fields = list(fields or _FIELDS)
+        requested = fields if "time_msc" in fields else ["time_msc"] + fields
+        shards = TicksRangeClient.shards(from_date, to_date, shard)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                executor.submit(
+                    self.__fetch,
+                    index,
+                    symbol,
+                    start,
+                    end,
+                    index == len(shards) - 1,
+                    type,
+                    requested,
+                    compact,
+                )
+                for index, (start, end) in enumerate(shards)
+            ]
+            parts = [future.result() for future in futures]
+
+        if len(parts) == 0:
+            return np.zeros(0, dtype=[(name, np.float64) for name in fields])
+
+        ticks = np.zeros(
+            sum(len(part["time_msc"]) for part in parts),
+            dtype=[(name, parts[0][name].dtype) for name in fields],
+        )
+        for name in fields:
+            np.concatenate([part[name] for part in parts], out=ticks[name])
+
+        logger.info(
+            "%s ticks in %s shards, %.1fs",
+            len(ticks),
+            len(shards),
+            time.perf_counter() - started,
+        )
+        return ticks
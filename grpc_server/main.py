@@ -1,27 +1,38 @@
+import argparse
 import asyncio
 import logging
 import sys
 import grpc
 
+import Admin_pb2_grpc as AdminService
 import MarketData_pb2_grpc as services
 import OrderManagementSystem_pb2_grpc as OrderManagementSystemService
 
+from terminal.Admin import Admin
+from terminal.Extensions.Backend import Backend
+from terminal.Extensions.ConnectionSupervisor import ConnectionSupervisor
+from terminal.Extensions.Profiler import Profiler
 from terminal.Extensions.MT5Ext import MT5Ext
+from terminal.Extensions.Replay import Replay
 from terminal.MarketData import MarketData
 from terminal.OrderManagementSystem import OrderManagementSystem
 
 
-async def serve():
+async def serve(ports, book_poll_interval):
     logger = logging.getLogger("app")
 
     server = grpc.aio.server()
+    profiler = Profiler()
 
-    services.add_MarketDataServicer_to_server(MarketData(), server)
+    services.add_MarketDataServicer_to_server(
+        profiler.instrument(MarketData(book_poll_interval)), server
+    )
     OrderManagementSystemService.add_OrderManagementSystemServicer_to_server(
-        OrderManagementSystem(), server
+        profiler.instrument(OrderManagementSystem()), server
     )
+    AdminService.add_AdminServicer_to_server(Admin(profiler), server)
 
-    for port in sys.argv[1:]:
+    for port in ports:
         address = f"[::]:{port}"
         server.add_insecure_port(address)
         logger.info("listening on %s", address)
@@ -31,7 +42,53 @@ async def serve():
     await server.wait_for_termination()
 
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("ports", nargs="+")
+    parser.add_argument("--backend", choices=["mt5", "replay"], default="mt5")
+    parser.add_argument(
+        "--replay",
+        action="append",
+        default=[],
+        metavar="SYMBOL=PATH",
+        help="tick file (.pkl, .npy or .npz) replayed for SYMBOL",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="replay clock multiplier, 0 replays at maximum speed",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=0.0,
+        help="simulated terminal call latency in seconds",
+    )
+    parser.add_argument(
+        "--book-poll-interval",
+        type=float,
+        default=0.1,
+        help="seconds between market book reads, shared by every subscriber of a symbol",
+    )
+    parser.add_argument(
+        "--probe-interval",
+        type=float,
+        default=5.0,
+        help="seconds between terminal health probes",
+    )
+    parser.add_argument(
+        "--max-backoff",
+        type=float,
+        default=30.0,
+        help="maximum seconds between reconnect attempts",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     logging.basicConfig(
         format="%(asctime)s %(levelname)s:%(name)s: %(message)s",
         level=logging.INFO,
@@ -41,6 +98,20 @@ if __name__ == "__main__":
 
     logging.getLogger("chardet.charsetprober").disabled = True
 
+    if args.backend == "replay":
+        Backend.use(
+            Replay(
+                dict(source.split("=", 1) for source in args.replay),
+                speed=args.replay_speed,
+                latency=args.replay_latency,
+            )
+        )
+
     MT5Ext.initialize()
+    MT5Ext.supervisor = ConnectionSupervisor(
+        probe_interval=args.probe_interval, max_backoff=args.max_backoff
+    ).start()
 
-    asyncio.get_event_loop().run_until_complete(serve())
+    asyncio.get_event_loop().run_until_complete(
+        serve(args.ports, args.book_poll_interval)
+    )
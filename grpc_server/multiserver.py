@@ -1,17 +1,40 @@
 from asyncio import sleep
+import argparse
 import asyncio
 import subprocess
 import sys
 
 
+def parse_args(argv):
+    # everything after "--" is forwarded unchanged to every main.py
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s PORT[+N] [PORT[+N] ...] [-- MAIN_OPTIONS ...]"
+    )
+    parser.add_argument(
+        "ports",
+        nargs="+",
+        metavar="PORT[+N]",
+        help="starts PORT and the N following ports",
+    )
+
+    if "--" in argv:
+        separator = argv.index("--")
+        argv, options = argv[:separator], argv[separator + 1 :]
+    else:
+        options = []
+
+    return parser.parse_args(argv), options
+
+
 if __name__ == "__main__":
-    for portSetting in sys.argv[1:]:
+    args, options = parse_args(sys.argv[1:])
+    for portSetting in args.ports:
         value = portSetting.split("+")
         port = int(value[0])
         quantity = int(value[1]) if len(value) > 1 else 0
         quantity += 1
         for i in range(quantity):
-            sp = subprocess.Popen(f"python main.py {port}")
+            sp = subprocess.Popen(["python", "main.py", str(port), *options])
             port += 1
     while True:
         asyncio.get_event_loop().run_until_complete(sleep(1))
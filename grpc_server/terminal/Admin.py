@@ -0,0 +1,179 @@
+import logging
+
+import Admin_pb2 as protos
+import Admin_pb2_grpc as services
+import Contracts_pb2 as contractsProtos
+import google.protobuf.timestamp_pb2 as timestampProtos
+import google.protobuf.wrappers_pb2 as wrappersProtos
+
+from terminal.Extensions.MT5Ext import MT5Ext
+from terminal.Extensions.Profiler import Profiler, ProfilerBusy
+
+logger = logging.getLogger("app")
+
+_DEFAULT_PROFILE_SECONDS = 10.0
+_DEFAULT_LIMIT = 30
+
+
+class Admin(services.AdminServicer):
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def __timestamp(self, value):
+        timestamp = timestampProtos.Timestamp()
+        timestamp.FromMilliseconds(int(value * 1000))
+        return timestamp
+
+    def __status(self, error):
+        return contractsProtos.ResponseStatus(
+            responseCode=int(error[0]),
+            responseMessage=wrappersProtos.StringValue(value=error[1]),
+        )
+
+    def GetConnectionStatus(self, request, _):
+        supervisor = MT5Ext.supervisor
+
+        if supervisor is None:
+            return protos.GetConnectionStatusReply(
+                responseStatus=contractsProtos.ResponseStatus(
+                    responseCode=contractsProtos.RES_E_NOT_FOUND,
+                    responseMessage=wrappersProtos.StringValue(
+                        value="connection supervisor is not running"
+                    ),
+                )
+            )
+
+        metrics = supervisor.metrics()
+
+        return protos.GetConnectionStatusReply(
+            state=metrics["state"],
+            since=self.__timestamp(metrics["since"]),
+            lastError=self.__status(metrics["error"]),
+            reconnectAttempts=metrics["reconnect_attempts"],
+            reconnectFailures=metrics["reconnect_failures"],
+            downtimeSeconds=metrics["downtime"],
+            transitionCounts=[
+                protos.ConnectionTransitionCount(
+                    fromState=fromState, toState=toState, count=count
+                )
+                for (fromState, toState), count in metrics["transition_counts"].items()
+            ],
+            transitions=[
+                protos.ConnectionTransition(
+                    time=self.__timestamp(time),
+                    fromState=fromState,
+                    toState=toState,
+                    error=self.__status(error),
+                )
+                for time, fromState, toState, error in metrics["transitions"]
+            ],
+            responseStatus=contractsProtos.ResponseStatus(
+                responseCode=contractsProtos.RES_S_OK,
+                responseMessage=wrappersProtos.StringValue(value="Success"),
+            ),
+        )
+
+    def __ok(self):
+        return contractsProtos.ResponseStatus(
+            responseCode=contractsProtos.RES_S_OK,
+            responseMessage=wrappersProtos.StringValue(value="Success"),
+        )
+
+    def __failed(self, code, message):
+        return contractsProtos.ResponseStatus(
+            responseCode=code,
+            responseMessage=wrappersProtos.StringValue(value=message),
+        )
+
+    def Profile(self, request, _):
+        seconds = (
+            request.duration.ToTimedelta().total_seconds() or _DEFAULT_PROFILE_SECONDS
+        )
+
+        try:
+            stats, calls, elapsed = self.profiler.profile(
+                seconds, request.method or None, max(request.calls, 0)
+            )
+            functions, report = Profiler.functions(
+                stats, request.sortBy or "cumulative", request.limit or _DEFAULT_LIMIT
+            )
+        except ProfilerBusy as error:
+            return protos.ProfileReply(
+                responseStatus=self.__failed(contractsProtos.RES_E_FAIL, str(error))
+            )
+        except ValueError as error:
+            return protos.ProfileReply(
+                responseStatus=self.__failed(
+                    contractsProtos.RES_E_INVALID_PARAMS, str(error)
+                )
+            )
+        except KeyError:
+            return protos.ProfileReply(
+                responseStatus=self.__failed(
+                    contractsProtos.RES_E_INVALID_PARAMS,
+                    f"unknown sortBy {request.sortBy}",
+                )
+            )
+
+        return protos.ProfileReply(
+            seconds=elapsed,
+            calls=calls,
+            functions=[
+                protos.ProfileFunction(
+                    file=file,
+                    line=line,
+                    function=function,
+                    primitiveCalls=primitive,
+                    calls=count,
+                    totalSeconds=total,
+                    cumulativeSeconds=cumulative,
+                )
+                for (file, line, function), primitive, count, total, cumulative in functions
+            ],
+            report=report,
+            responseStatus=self.__ok(),
+        )
+
+    def TraceMalloc(self, request, _):
+        seconds = (
+            request.duration.ToTimedelta().total_seconds() or _DEFAULT_PROFILE_SECONDS
+        )
+        groupBy = request.groupBy or "lineno"
+
+        if groupBy not in ["lineno", "filename", "traceback"]:
+            return protos.TraceMallocReply(
+                responseStatus=self.__failed(
+                    contractsProtos.RES_E_INVALID_PARAMS, f"unknown groupBy {groupBy}"
+                )
+            )
+
+        try:
+            sites, traced, peak, elapsed = self.profiler.trace_malloc(
+                seconds,
+                max(request.frames, 1),
+                groupBy,
+                request.limit or _DEFAULT_LIMIT,
+            )
+        except ProfilerBusy as error:
+            return protos.TraceMallocReply(
+                responseStatus=self.__failed(contractsProtos.RES_E_FAIL, str(error))
+            )
+
+        return protos.TraceMallocReply(
+            seconds=elapsed,
+            tracedBytes=traced,
+            peakBytes=peak,
+            sites=[
+                protos.AllocationSite(
+                    traceback=[
+                        f"{frame.filename}:{frame.lineno}" for frame in site.traceback
+                    ],
+                    sizeBytes=site.size,
+                    count=site.count,
+                    sizeDiffBytes=site.size_diff,
+                    countDiff=site.count_diff,
+                )
+                for site in sites
+            ],
+            responseStatus=self.__ok(),
+        )
@@ -0,0 +1,152 @@
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("app")
+
+_SUFFIX = ".pkl"
+
+
+class AnalysisCache:
+
+    def __init__(self, directory=".analysis_cache", max_bytes=2 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def __values(digest, value):
+        digest.update(f"{type(value).__name__}:{value.name}:{value.dtype}".encode())
+        if isinstance(value.dtype, pd.DatetimeTZDtype):
+            # avoids hashing an object array of Timestamps
+            value = value.dt if isinstance(value, pd.Series) else value
+            value = value.tz_convert(None)
+        AnalysisCache.__update(digest, value.to_numpy())
+
+    @staticmethod
+    def __update(digest, value):
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            digest.update(f"ndarray:{value.dtype.descr}:{value.shape}".encode())
+            if value.dtype.hasobject:
+                digest.update(pickle.dumps(value.tolist(), pickle.HIGHEST_PROTOCOL))
+            else:
+                digest.update(memoryview(value.view(np.uint8).reshape(-1)))
+        elif isinstance(value, (pd.Series, pd.Index)):
+            AnalysisCache.__values(digest, value)
+            if isinstance(value, pd.Series):
+                AnalysisCache.__values(digest, value.index)
+        elif isinstance(value, pd.DataFrame):
+            digest.update(f"DataFrame:{list(value.columns)}".encode())
+            AnalysisCache.__values(digest, value.index)
+            for column in value.columns:
+                AnalysisCache.__values(digest, value[column])
+        elif isinstance(value, dict):
+            digest.update(b"dict")
+            for key in sorted(value, key=repr):
+                AnalysisCache.__update(digest, key)
+                AnalysisCache.__update(digest, value[key])
+        elif isinstance(value, (list, tuple)):
+            digest.update(f"{type(value).__name__}:{len(value)}".encode())
+            for item in value:
+                AnalysisCache.__update(digest, item)
+        elif inspect.isfunction(value) or inspect.isclass(value):
+            # code changes invalidate the results computed by it, the whole module is
+            # hashed to cover the helpers it calls, notebooks only have the own source
+            source = ""
+            for code in [inspect.getmodule(value), value]:
+                try:
+                    source = inspect.getsource(code)
+                    break
+                except (OSError, TypeError):
+                    continue
+            digest.update(f"{value.__module__}.{value.__qualname__}:{source}".encode())
+        else:
+            digest.update(f"{type(value).__name__}:{value!r}".encode())
+
+    @staticmethod
+    def fingerprint(*values, **params):
+        digest = hashlib.blake2b(digest_size=20)
+        AnalysisCache.__update(digest, list(values))
+        AnalysisCache.__update(digest, params)
+        return digest.hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.directory, key[:2], key + _SUFFIX)
+
+    def get(self, key, default=None):
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # stale or corrupt entries, e.g. pickled by another version of a library,
+            # are computed again and overwritten
+            logger.warning("unreadable cache entry %s", path, exc_info=True)
+            return default
+
+        # the modification time orders the eviction, hits keep entries alive
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(_SUFFIX):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            logger.debug("evicted %s, %s bytes", path, size)
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def __call__(self, step, function, *args, **params):
+        # function(*args, **params) computed once per distinct input and parameters
+        started = time.perf_counter()
+        key = AnalysisCache.fingerprint(step, function, *args, **params)
+
+        value = self.get(key, self)
+        if value is not self:
+            logger.info(
+                "%s: cached %s, %.2fs", step, key[:12], time.perf_counter() - started
+            )
+            return value
+
+        value = function(*args, **params)
+        self.put(key, value)
+        logger.info(
+            "%s: computed %s, %.2fs", step, key[:12], time.perf_counter() - started
+        )
+        return value
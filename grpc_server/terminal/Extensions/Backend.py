@@ -0,0 +1,31 @@
+import importlib
+import logging
+
+logger = logging.getLogger("app")
+
+
+class Backend:
+    _terminal = None
+
+    @staticmethod
+    def use(terminal):
+        logger.info(
+            "terminal backend: %s", getattr(terminal, "__name__", type(terminal).__name__)
+        )
+        Backend._terminal = terminal
+
+    @staticmethod
+    def current():
+        if Backend._terminal is None:
+            Backend._terminal = importlib.import_module("MetaTrader5")
+        return Backend._terminal
+
+
+class _Terminal:
+
+    def __getattr__(self, name):
+        return getattr(Backend.current(), name)
+
+
+# drop-in replacement for "import MetaTrader5 as mt5" that forwards to the selected backend
+mt5 = _Terminal()
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+
+from collections import Counter, deque
+
+import Contracts_pb2 as contractsProtos
+import google.protobuf.wrappers_pb2 as wrappersProtos
+
+from terminal.Extensions.Backend import mt5
+
+logger = logging.getLogger("app")
+
+CONNECTED = contractsProtos.CONNECTION_STATE_CONNECTED
+DISCONNECTED = contractsProtos.CONNECTION_STATE_DISCONNECTED
+RECONNECTING = contractsProtos.CONNECTION_STATE_RECONNECTING
+
+
+class ConnectionSupervisor:
+
+    def __init__(
+        self, probe_interval=5.0, min_backoff=1.0, max_backoff=30.0, history_size=100
+    ):
+        self.probe_interval = probe_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+        self.state = CONNECTED
+        self.since = time.time()
+        self.down_since = None
+        self.error = (mt5.RES_S_OK, "Success")
+        self.reconnect_attempts = 0
+        self.reconnect_failures = 0
+        self.downtime = 0.0
+        self.transition_counts = Counter()
+        self.transitions = deque(maxlen=history_size)
+
+    @staticmethod
+    def is_internal_fail(code):
+        return code in [
+            mt5.RES_E_INTERNAL_FAIL,
+            mt5.RES_E_INTERNAL_FAIL_SEND,
+            mt5.RES_E_INTERNAL_FAIL_RECEIVE,
+            mt5.RES_E_INTERNAL_FAIL_INIT,
+            mt5.RES_E_INTERNAL_FAIL_CONNECT,
+            mt5.RES_E_INTERNAL_FAIL_TIMEOUT,
+        ]
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.__run, name="ConnectionSupervisor", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def connected(self):
+        return self.state == CONNECTED
+
+    def report(self, error):
+        if ConnectionSupervisor.is_internal_fail(error[0]):
+            self.__transition(DISCONNECTED, error, only_from=CONNECTED)
+            self.wake.set()
+
+    def response_status(self):
+        with self.lock:
+            code, message = self.error
+            attempts = self.reconnect_attempts
+        return contractsProtos.ResponseStatus(
+            responseCode=int(code)
+            if ConnectionSupervisor.is_internal_fail(code)
+            else contractsProtos.RES_E_INTERNAL_FAIL_CONNECT,
+            responseMessage=wrappersProtos.StringValue(
+                value=f"terminal disconnected, reconnecting (attempt {attempts}): {message}"
+            ),
+        )
+
+    def metrics(self):
+        with self.lock:
+            outage = time.time() - self.down_since if self.down_since is not None else 0.0
+            return {
+                "state": self.state,
+                "since": self.since,
+                "error": self.error,
+                "reconnect_attempts": self.reconnect_attempts,
+                "reconnect_failures": self.reconnect_failures,
+                "downtime": self.downtime + outage,
+                "transition_counts": dict(self.transition_counts),
+                "transitions": list(self.transitions),
+            }
+
+    def __transition(self, state, error, only_from=None):
+        with self.lock:
+            previous = self.state
+            if previous == state or (only_from is not None and previous != only_from):
+                return False
+
+            # an outage spans every DISCONNECTED and RECONNECTING step until CONNECTED
+            now = time.time()
+            if previous == CONNECTED:
+                self.down_since = now
+            elif state == CONNECTED:
+                self.downtime += now - self.down_since
+                self.down_since = None
+
+            self.state = state
+            self.since = now
+            self.error = error
+            self.transition_counts[(previous, state)] += 1
+            self.transitions.append((now, previous, state, error))
+
+        logger.log(
+            logging.INFO if state == CONNECTED else logging.WARNING,
+            "terminal connection %s -> %s, error code = %s",
+            contractsProtos.ConnectionState.Name(previous),
+            contractsProtos.ConnectionState.Name(state),
+            error,
+        )
+        return True
+
+    def __probe(self):
+        info = mt5.terminal_info()
+        error = mt5.last_error()
+        if info is None and ConnectionSupervisor.is_internal_fail(error[0]):
+            self.report(error)
+
+    def __reconnect(self):
+        with self.lock:
+            self.reconnect_attempts += 1
+
+        self.__transition(RECONNECTING, self.error)
+        mt5.shutdown()
+
+        if mt5.initialize():
+            self.__transition(CONNECTED, mt5.last_error())
+            return True
+
+        with self.lock:
+            self.reconnect_failures += 1
+        self.__transition(DISCONNECTED, mt5.last_error())
+        return False
+
+    def __run(self):
+        backoff = self.min_backoff
+
+        while not self.stopped.is_set():
+            if self.state == CONNECTED:
+                self.wake.wait(self.probe_interval)
+                self.wake.clear()
+                if not self.stopped.is_set() and self.state == CONNECTED:
+                    try:
+                        self.__probe()
+                    except Exception:
+                        logger.exception("terminal probe failed")
+                backoff = self.min_backoff
+                continue
+
+            try:
+                if self.__reconnect():
+                    continue
+            except Exception:
+                logger.exception("terminal reconnect failed")
+
+            self.stopped.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
@@ -0,0 +1,65 @@
+import base64
+import hashlib
+
+import numpy as np
+
+_VERSION = "1"
+_TRANSFER_FIELDS = ["continuationToken", "chunkSize", "ticksPerPayload"]
+
+
+class Continuation:
+
+    @staticmethod
+    def fingerprint(request):
+        # binds a token to the ticks requested, chunking may change between transfers
+        request = type(request).FromString(request.SerializeToString())
+        for name in _TRANSFER_FIELDS:
+            if name in request.DESCRIPTOR.fields_by_name:
+                request.ClearField(name)
+        return hashlib.blake2b(
+            request.SerializeToString(deterministic=True), digest_size=8
+        ).hexdigest()
+
+    @staticmethod
+    def issue(request, time_msc, offset):
+        fingerprint = Continuation.fingerprint(request)
+        token = f"{_VERSION}.{int(time_msc)}.{int(offset)}.{fingerprint}"
+        return base64.urlsafe_b64encode(token.encode()).decode()
+
+    @staticmethod
+    def resume(request):
+        if not request.continuationToken:
+            return 0, 0
+
+        try:
+            version, time_msc, offset, fingerprint = (
+                base64.urlsafe_b64decode(request.continuationToken.encode())
+                .decode()
+                .split(".")
+            )
+            time_msc, offset = int(time_msc), int(offset)
+        except ValueError as error:
+            raise ValueError("invalid continuation token") from error
+
+        if version != _VERSION or fingerprint != Continuation.fingerprint(request):
+            raise ValueError("continuation token was issued for another request")
+
+        return time_msc, offset
+
+    @staticmethod
+    def offsets(times):
+        # 1-based position of every tick among the ticks at its millisecond
+        return np.arange(1, len(times) + 1) - np.searchsorted(times, times, side="left")
+
+    @staticmethod
+    def positions(times, offsets, ends, time_msc, offset):
+        # (time_msc, offset) after each delivered tick index in ends, offsets count the
+        # ticks passing the filter mask from the first one at that millisecond
+        positions = []
+        for end in ends:
+            if end < 0:
+                positions.append((time_msc, offset))
+                continue
+
+            positions.append((int(times[end]), int(offsets[end])))
+        return positions
@@ -0,0 +1,265 @@
+import math
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class RingBuffer:
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.index = 0
+        self.count = 0
+
+    def push(self, value):
+        evicted = self.values[self.index]
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        return evicted
+
+    def full(self):
+        return self.count == self.size
+
+
+class SMA:
+
+    def __init__(self, period):
+        self.period = period
+        self.buffer = RingBuffer(period)
+        self.sum = 0.0
+
+    def update(self, bar):
+        price = float(bar["close"])
+        self.sum += price - self.buffer.push(price)
+
+        if self.buffer.index == 0:
+            # resync once per lap so the running sum does not drift
+            self.sum = math.fsum(self.buffer.values)
+
+        if not self.buffer.full():
+            return math.nan
+
+        return self.sum / self.period
+
+    def batch(self, columns):
+        close = columns["close"]
+        values = np.full(len(close), np.nan)
+
+        if len(close) >= self.period:
+            values[self.period - 1 :] = sliding_window_view(close, self.period).mean(
+                axis=1
+            )
+
+        return values
+
+    def seed(self, columns):
+        self.buffer = RingBuffer(self.period)
+        for price in columns["close"][-self.period :]:
+            self.buffer.push(float(price))
+        self.sum = math.fsum(self.buffer.values)
+
+
+class EMA:
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.value = None
+        self.count = 0
+
+    def update(self, bar):
+        price = float(bar["close"])
+        self.count += 1
+
+        if self.value is None:
+            self.value = price
+        else:
+            self.value += self.alpha * (price - self.value)
+
+        if self.count < self.period:
+            return math.nan
+
+        return self.value
+
+    def batch(self, columns):
+        return (
+            pd.Series(columns["close"])
+            .ewm(span=self.period, adjust=False, min_periods=self.period)
+            .mean()
+            .to_numpy()
+        )
+
+    def seed(self, columns):
+        close = columns["close"]
+        self.count = len(close)
+        self.value = (
+            float(pd.Series(close).ewm(span=self.period, adjust=False).mean().iloc[-1])
+            if len(close) > 0
+            else None
+        )
+
+
+class ATR:
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.tr_sum = 0.0
+        self.value = math.nan
+        self.count = 0
+
+    @staticmethod
+    def true_range(high, low, close):
+        prev_close = np.r_[np.nan, close[:-1]]
+        ranges = np.vstack(
+            [high - low, np.abs(high - prev_close), np.abs(low - prev_close)]
+        )
+        return np.nanmax(ranges, axis=0)
+
+    def update(self, bar):
+        high, low, close = float(bar["high"]), float(bar["low"]), float(bar["close"])
+
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+        self.prev_close = close
+        self.count += 1
+
+        if self.count < self.period:
+            self.tr_sum += tr
+            return math.nan
+
+        if self.count == self.period:
+            self.value = (self.tr_sum + tr) / self.period
+        else:
+            self.value += (tr - self.value) / self.period
+
+        return self.value
+
+    def batch(self, columns):
+        tr = ATR.true_range(columns["high"], columns["low"], columns["close"])
+        values = np.full(len(tr), np.nan)
+
+        if len(tr) >= self.period:
+            # wilder smoothing seeded with the simple mean of the first period
+            seeded = tr[self.period - 1 :].copy()
+            seeded[0] = tr[: self.period].mean()
+            values[self.period - 1 :] = (
+                pd.Series(seeded).ewm(alpha=1.0 / self.period, adjust=False).mean()
+            )
+
+        return values
+
+    def seed(self, columns):
+        close = columns["close"]
+        self.count = len(close)
+        self.prev_close = float(close[-1]) if len(close) > 0 else None
+
+        if self.count < self.period:
+            tr = ATR.true_range(columns["high"], columns["low"], close)
+            self.tr_sum = float(tr.sum())
+            self.value = math.nan
+        else:
+            self.value = float(self.batch(columns)[-1])
+
+
+class VWAP:
+
+    def __init__(self, period=0):
+        self.period = period
+        self.session = None
+        self.pv_sum = 0.0
+        self.volume_sum = 0.0
+
+    def update(self, bar):
+        session = pd.Timestamp(bar["time"]).normalize()
+
+        if session != self.session:
+            self.session = session
+            self.pv_sum = 0.0
+            self.volume_sum = 0.0
+
+        typical = (float(bar["high"]) + float(bar["low"]) + float(bar["close"])) / 3
+        self.pv_sum += typical * float(bar["volume"])
+        self.volume_sum += float(bar["volume"])
+
+        if self.volume_sum == 0:
+            return math.nan
+
+        return self.pv_sum / self.volume_sum
+
+    @staticmethod
+    def session_starts(time):
+        sessions = time.astype("datetime64[D]")
+        starts = np.r_[True, sessions[1:] != sessions[:-1]]
+        return np.maximum.accumulate(np.where(starts, np.arange(len(time)), 0))
+
+    def batch(self, columns):
+        if len(columns["close"]) == 0:
+            return np.array([], dtype=np.float64)
+
+        typical = (columns["high"] + columns["low"] + columns["close"]) / 3
+        pv = np.cumsum(typical * columns["volume"])
+        volume = np.cumsum(columns["volume"])
+
+        starts = VWAP.session_starts(columns["time"])
+        base_pv = np.where(starts > 0, pv[starts - 1], 0.0)
+        base_volume = np.where(starts > 0, volume[starts - 1], 0.0)
+
+        session_volume = volume - base_volume
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(session_volume > 0, (pv - base_pv) / session_volume, np.nan)
+
+    def seed(self, columns):
+        time = columns["time"]
+
+        if len(time) == 0:
+            self.session = None
+            return
+
+        start = VWAP.session_starts(time)[-1]
+        typical = (
+            columns["high"][start:] + columns["low"][start:] + columns["close"][start:]
+        ) / 3
+        self.session = pd.Timestamp(time[-1]).normalize()
+        self.pv_sum = float((typical * columns["volume"][start:]).sum())
+        self.volume_sum = float(columns["volume"][start:].sum())
+
+
+class Indicators:
+
+    @staticmethod
+    def columns(bars):
+        if isinstance(bars, pd.DataFrame):
+            frame = bars
+        else:
+            frame = pd.DataFrame(bars)
+
+        if "time" in frame.columns:
+            unit = "s" if np.issubdtype(frame["time"].dtype, np.integer) else None
+            time = pd.to_datetime(frame["time"], unit=unit)
+        else:
+            time = pd.to_datetime(frame.index)
+
+        for volume in ["volume", "real_volume", "tick_volume"]:
+            if volume in frame.columns:
+                break
+
+        return {
+            "time": np.asarray(time, dtype="datetime64[ns]"),
+            "open": frame["open"].to_numpy(dtype=np.float64),
+            "high": frame["high"].to_numpy(dtype=np.float64),
+            "low": frame["low"].to_numpy(dtype=np.float64),
+            "close": frame["close"].to_numpy(dtype=np.float64),
+            "volume": frame[volume].to_numpy(dtype=np.float64),
+        }
+
+    @staticmethod
+    def batch(bars, indicators):
+        columns = Indicators.columns(bars)
+        return [indicator.batch(columns) for indicator in indicators]
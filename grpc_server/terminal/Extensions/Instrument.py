@@ -0,0 +1,72 @@
+import functools
+import inspect
+
+
+class Instrument:
+
+    @staticmethod
+    def methods(servicer):
+        return [
+            name
+            for name in dir(servicer)
+            if name[:1].isupper() and callable(getattr(servicer, name))
+        ]
+
+    @staticmethod
+    def wrap(servicer, hook, done=None):
+        # hook(name, context) returns a context manager entered around every step of
+        # the sync handlers, done(name, context) is called once the call finished
+        for name in Instrument.methods(servicer):
+            method = getattr(servicer, name)
+            setattr(servicer, name, Instrument.wrap_method(name, method, hook, done))
+
+        return servicer
+
+    @staticmethod
+    def wrap_method(name, method, hook, done=None):
+        if inspect.isasyncgenfunction(method):
+            # a step awaits on the event loop, a hook around it would also measure
+            # every other task running meanwhile, so only done is reported
+            @functools.wraps(method)
+            async def subscription(request, context):
+                iterator = method(request, context)
+                try:
+                    async for item in iterator:
+                        yield item
+                finally:
+                    await iterator.aclose()
+                    if done is not None:
+                        done(name, context)
+
+            return subscription
+
+        if inspect.isgeneratorfunction(method):
+
+            @functools.wraps(method)
+            def stream(request, context):
+                iterator = method(request, context)
+                try:
+                    while True:
+                        with hook(name, context):
+                            try:
+                                item = next(iterator)
+                            except StopIteration:
+                                return
+                        yield item
+                finally:
+                    iterator.close()
+                    if done is not None:
+                        done(name, context)
+
+            return stream
+
+        @functools.wraps(method)
+        def unary(request, context):
+            try:
+                with hook(name, context):
+                    return method(request, context)
+            finally:
+                if done is not None:
+                    done(name, context)
+
+        return unary
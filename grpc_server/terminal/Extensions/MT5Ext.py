@@ -1,21 +1,30 @@
+import functools
+import inspect
 import logging
+import time
 
-import MetaTrader5 as mt5
+from datetime import timedelta
+
+import numpy as np
 import pandas as pd
 import Contracts_pb2 as contractsProtos
 import google.protobuf.wrappers_pb2 as wrappersProtos
 
+from terminal.Extensions.Backend import mt5
+from terminal.Extensions.ConnectionSupervisor import ConnectionSupervisor
+
 logger = logging.getLogger("app")
 
 
 class MT5Ext:
+    supervisor = None
 
     @staticmethod
     def initialize():
         if not mt5.initialize():
             error = mt5.last_error()
             logger.error("initialize failed, error code = %s", error)
-            raise f"initialize failed, error code = {error}"
+            raise RuntimeError(f"initialize failed, error code = {error}")
 
     @staticmethod
     def create_ticks_dataframe(ticks):
@@ -39,6 +48,130 @@ class MT5Ext:
         rates.dropna(inplace=True)
         return rates
 
+    @staticmethod
+    def ticks_after(ticks, time_msc, offset):
+        # ticks are sorted by time_msc, offset counts the ticks already consumed at time_msc
+        times = ticks["time_msc"]
+        ticks = ticks[int(np.searchsorted(times, time_msc, side="left")) + offset :]
+
+        if len(ticks) > 0:
+            time_msc = int(times[-1])
+            offset = len(times) - int(np.searchsorted(times, time_msc, side="left"))
+
+        return ticks, time_msc, offset
+
+    @staticmethod
+    def ticks_by_day(symbol, date_from, date_to, flags, end_hour=23):
+        # one copy_ticks_range per day, from the time of day of date_from until end_hour
+        day = date_from
+        count = 0
+        started = time.perf_counter()
+
+        while day < date_to:
+            day_started = time.perf_counter()
+            ticks = mt5.copy_ticks_range(
+                symbol, day, min(day.replace(hour=end_hour), date_to), flags
+            )
+            elapsed = max(time.perf_counter() - day_started, 1e-9)
+
+            if (
+                ticks is None
+                or mt5.last_error()[0] != mt5.RES_S_OK
+                or len(ticks.shape) != 1
+            ):
+                logger.warning(
+                    "%s %s: copy_ticks_range failed, error code = %s",
+                    symbol,
+                    day.date(),
+                    mt5.last_error(),
+                )
+            else:
+                count += len(ticks)
+                logger.info(
+                    "%s %s: %s ticks, %.2fs, %.0f ticks/s, %.1f MB/s",
+                    symbol,
+                    day.date(),
+                    len(ticks),
+                    elapsed,
+                    len(ticks) / elapsed,
+                    ticks.nbytes / elapsed / 1024**2,
+                )
+                yield ticks
+
+            day += timedelta(days=1)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        logger.info(
+            "%s: %s ticks, %.2fs, %.0f ticks/s", symbol, count, elapsed, count / elapsed
+        )
+
+    @staticmethod
+    def load_ticks(symbol, date_from, date_to, flags, end_hour=23, memmap=None):
+        # daily chunks are concatenated once, or appended to the memmap file so only
+        # one day is held in memory, returns None when no ticks were copied
+        chunks = MT5Ext.ticks_by_day(symbol, date_from, date_to, flags, end_hour)
+
+        if memmap is None:
+            chunks = list(chunks)
+            return np.concatenate(chunks) if chunks else None
+
+        count, dtype = 0, None
+        with open(memmap, "wb") as file:
+            for ticks in chunks:
+                ticks.tofile(file)
+                count, dtype = count + len(ticks), ticks.dtype
+
+        if count == 0:
+            return None
+        return np.memmap(memmap, dtype=dtype, mode="r", shape=(count,))
+
+    @staticmethod
+    def unavailable():
+        supervisor = MT5Ext.supervisor
+        if supervisor is None or supervisor.connected():
+            return None
+        return supervisor.response_status()
+
+    @staticmethod
+    def fail_fast(reply):
+        # replies the supervisor status without touching the terminal while it is down
+        def decorator(method):
+            if inspect.isasyncgenfunction(method):
+
+                @functools.wraps(method)
+                async def subscription(self, request, context):
+                    responseStatus = MT5Ext.unavailable()
+                    if responseStatus is not None:
+                        yield reply(responseStatus=responseStatus)
+                        return
+                    async for item in method(self, request, context):
+                        yield item
+
+                return subscription
+
+            if inspect.isgeneratorfunction(method):
+
+                @functools.wraps(method)
+                def stream(self, request, context):
+                    responseStatus = MT5Ext.unavailable()
+                    if responseStatus is not None:
+                        yield reply(responseStatus=responseStatus)
+                        return
+                    yield from method(self, request, context)
+
+                return stream
+
+            @functools.wraps(method)
+            def unary(self, request, context):
+                responseStatus = MT5Ext.unavailable()
+                if responseStatus is not None:
+                    return reply(responseStatus=responseStatus)
+                return method(self, request, context)
+
+            return unary
+
+        return decorator
+
     @staticmethod
     def check_conn():
         error = mt5.last_error()
@@ -48,15 +181,20 @@ class MT5Ext:
         else:
             logger.error("response status, error code = %s", error)
 
-        if (
-            error[0] == mt5.RES_E_INTERNAL_FAIL
-            or error[0] == mt5.RES_E_INTERNAL_FAIL_SEND
-            or error[0] == mt5.RES_E_INTERNAL_FAIL_RECEIVE
-            or error[0] == mt5.RES_E_INTERNAL_FAIL_INIT
-            or error[0] == mt5.RES_E_INTERNAL_FAIL_CONNECT
-            or error[0] == mt5.RES_E_INTERNAL_FAIL_TIMEOUT
-        ):
-            MT5Ext.initialize()
+        if ConnectionSupervisor.is_internal_fail(error[0]):
+            if MT5Ext.supervisor is None:
+                try:
+                    MT5Ext.initialize()
+                except RuntimeError as exception:
+                    return contractsProtos.ResponseStatus(
+                        responseCode=contractsProtos.RES_E_FAIL,
+                        responseMessage=wrappersProtos.StringValue(
+                            value=str(exception)
+                        ),
+                    )
+            else:
+                MT5Ext.supervisor.report(error)
+                return MT5Ext.supervisor.response_status()
 
         return contractsProtos.ResponseStatus(
             responseCode=int(error[0]),
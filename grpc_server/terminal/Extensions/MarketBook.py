@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+import Contracts_pb2 as contractsProtos
+import google.protobuf.wrappers_pb2 as wrappersProtos
+
+from terminal.Extensions.Backend import mt5
+from terminal.Extensions.MT5Ext import MT5Ext
+
+logger = logging.getLogger("app")
+
+LEVEL_DTYPE = np.dtype([("type", "<i4"), ("price", "<f8"), ("volume", "<f8")])
+
+
+class MarketBook:
+
+    def __init__(self, sequence, time_msc, levels=None, responseStatus=None):
+        self.sequence = sequence
+        self.time_msc = time_msc
+        self.levels = levels if levels is not None else np.zeros(0, dtype=LEVEL_DTYPE)
+        self.responseStatus = responseStatus
+        # replies built once per book and shared by every subscriber
+        self.replies = {}
+
+    @staticmethod
+    def levels(book):
+        levels = np.zeros(len(book or ()), dtype=LEVEL_DTYPE)
+        for i, level in enumerate(book or ()):
+            volume = getattr(level, "volume_dbl", 0.0) or level.volume
+            levels[i] = (level.type, level.price, volume)
+        return levels
+
+    @staticmethod
+    def delta(previous, current):
+        # changed or new levels, removed levels are sent with volume 0
+        before = {(int(t), float(p)): float(v) for t, p, v in previous.levels}
+        after = {(int(t), float(p)): float(v) for t, p, v in current.levels}
+
+        changed = [
+            (t, p, v) for (t, p), v in after.items() if before.get((t, p)) != v
+        ] + [(t, p, 0.0) for (t, p) in before.keys() if (t, p) not in after]
+
+        return np.array(changed, dtype=LEVEL_DTYPE)
+
+
+class _Feed:
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.subscribers = 0
+        self.book = None
+        self.condition = asyncio.Condition()
+        self.task = None
+
+
+class MarketBookHub:
+
+    def __init__(self, poll_interval=0.1):
+        self.poll_interval = poll_interval
+        self.feeds = {}
+        self.polls = 0
+
+    def __add(self, symbol):
+        if mt5.market_book_add(symbol):
+            return None
+
+        responseStatus = MT5Ext.check_conn()
+        if responseStatus.responseCode == contractsProtos.RES_S_OK:
+            responseStatus = contractsProtos.ResponseStatus(
+                responseCode=contractsProtos.RES_E_FAIL,
+                responseMessage=wrappersProtos.StringValue(
+                    value=f"market_book_add failed for {symbol}"
+                ),
+            )
+        return responseStatus
+
+    def __read(self, symbol):
+        book = mt5.market_book_get(symbol)
+        responseStatus = MT5Ext.check_conn()
+        return book, responseStatus
+
+    async def __publish(self, feed, book):
+        async with feed.condition:
+            feed.book = book
+            feed.condition.notify_all()
+
+    async def __poll(self, feed):
+        loop = asyncio.get_running_loop()
+        sequence = 0
+        added = False
+
+        while True:
+            while feed.subscribers > 0:
+                responseStatus = MT5Ext.unavailable()
+
+                if responseStatus is None and not added:
+                    responseStatus = await loop.run_in_executor(
+                        None, self.__add, feed.symbol
+                    )
+                    added = responseStatus is None
+
+                if responseStatus is None:
+                    book, responseStatus = await loop.run_in_executor(
+                        None, self.__read, feed.symbol
+                    )
+                    self.polls += 1
+
+                time_msc = int(time.time() * 1000)
+
+                if responseStatus.responseCode != contractsProtos.RES_S_OK:
+                    # the terminal drops book subscriptions when it reconnects
+                    added = False
+                    if feed.book is None or feed.book.responseStatus is None:
+                        sequence += 1
+                        await self.__publish(
+                            feed,
+                            MarketBook(sequence, time_msc, responseStatus=responseStatus),
+                        )
+                else:
+                    levels = MarketBook.levels(book)
+                    if (
+                        feed.book is None
+                        or feed.book.responseStatus is not None
+                        or not np.array_equal(feed.book.levels, levels)
+                    ):
+                        sequence += 1
+                        await self.__publish(feed, MarketBook(sequence, time_msc, levels))
+
+                await asyncio.sleep(self.poll_interval)
+
+            if added:
+                await loop.run_in_executor(None, mt5.market_book_release, feed.symbol)
+                added = False
+
+            if feed.subscribers == 0:
+                del self.feeds[feed.symbol]
+                logger.info("market book %s released", feed.symbol)
+                return
+
+    def __acquire(self, symbol):
+        feed = self.feeds.get(symbol)
+        if feed is None:
+            feed = self.feeds[symbol] = _Feed(symbol)
+            feed.task = asyncio.get_running_loop().create_task(self.__poll(feed))
+            logger.info("market book %s subscribed", symbol)
+        feed.subscribers += 1
+        return feed
+
+    async def books(self, symbol):
+        # yields the latest book, subscribers slower than the poller skip intermediate books
+        feed = self.__acquire(symbol)
+        sequence = 0
+        try:
+            while True:
+                async with feed.condition:
+                    await feed.condition.wait_for(
+                        lambda: feed.book is not None and feed.book.sequence != sequence
+                    )
+                    book = feed.book
+                sequence = book.sequence
+                yield book
+        finally:
+            feed.subscribers -= 1
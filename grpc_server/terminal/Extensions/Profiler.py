@@ -0,0 +1,211 @@
+import contextlib
+import cProfile
+import inspect
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+from terminal.Extensions.Instrument import Instrument
+
+logger = logging.getLogger("app")
+
+_IDLE = contextlib.nullcontext()
+# since 3.12 cProfile runs on sys.monitoring, one enabled profiler sees every thread
+# and a second one cannot be enabled
+_PROCESS_WIDE = sys.version_info >= (3, 12)
+_IGNORED = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class Profiler:
+
+    def __init__(self):
+        self.session = threading.Lock()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.active = False
+        self.method = None
+        self.calls = 0
+        self.claimed = set()
+        self.started = 0
+        self.completed = 0
+        self.done = threading.Event()
+        self.stats = None
+        self.generation = 0
+        self.methods = set()
+
+    def instrument(self, servicer):
+        # async streams are suspended on the event loop between steps and are not profiled
+        self.methods.update(
+            name
+            for name in Instrument.methods(servicer)
+            if not inspect.isasyncgenfunction(getattr(servicer, name))
+        )
+        return Instrument.wrap(servicer, self, self.finished)
+
+    def __call__(self, name, context=None):
+        # Instrument hook, costs one attribute check while no profile is running
+        if not self.active or (self.method and name != self.method):
+            return _IDLE
+        return self.__step(context)
+
+    @contextlib.contextmanager
+    def __step(self, context):
+        if self.calls and not self.__claim(context):
+            yield
+            return
+
+        # one profiler per thread, nested steps on the same thread are skipped
+        if _PROCESS_WIDE or getattr(self.local, "profile", None) is not None:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiling tool is active, the call runs unprofiled
+            yield
+            return
+
+        self.local.profile = profile
+        generation = self.generation
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.local.profile = None
+            with self.lock:
+                # steps still running when their profile ended are dropped
+                if self.stats is not None and self.generation == generation:
+                    self.stats.add(profile)
+
+    def __claim(self, context):
+        with self.lock:
+            key = id(context)
+            if key in self.claimed:
+                return True
+            if self.started >= self.calls:
+                return False
+            self.started += 1
+            self.claimed.add(key)
+        return True
+
+    def finished(self, name, context):
+        # Instrument done callback, counts the claimed calls
+        if not self.active or not self.calls:
+            return
+
+        with self.lock:
+            if id(context) not in self.claimed:
+                return
+            self.claimed.discard(id(context))
+            self.completed += 1
+            if self.completed >= self.calls:
+                self.done.set()
+
+    def profile(self, seconds, method=None, calls=0):
+        if method and method not in self.methods:
+            raise ValueError(f"unknown or unprofiled method {method}")
+
+        if not self.session.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+
+        process = None
+        try:
+            if _PROCESS_WIDE:
+                # every thread is recorded, method and calls only bound the duration
+                process = cProfile.Profile()
+                try:
+                    process.enable()
+                except ValueError as error:
+                    process = None
+                    raise ProfilerBusy(str(error)) from error
+
+            with self.lock:
+                self.method = method
+                self.calls = calls
+                self.claimed = set()
+                self.started = 0
+                self.completed = 0
+                self.done.clear()
+                self.stats = pstats.Stats()
+                self.generation += 1
+                self.active = True
+
+            logger.info(
+                "profiling %s for %ss%s",
+                method or "all methods",
+                seconds,
+                f" or {calls} calls" if self.calls else "",
+            )
+
+            started = time.perf_counter()
+            self.done.wait(seconds)
+            elapsed = time.perf_counter() - started
+
+            if process is not None:
+                process.disable()
+
+            with self.lock:
+                self.active = False
+                stats, self.stats = self.stats, None
+                completed = self.completed
+                if process is not None:
+                    stats.add(process)
+
+            return stats, completed, elapsed
+        finally:
+            if process is not None:
+                process.disable()
+            self.session.release()
+
+    @staticmethod
+    def functions(stats, sort_by="cumulative", limit=30):
+        stats.sort_stats(sort_by)
+        functions = []
+        for function in (stats.fcn_list or [])[:limit]:
+            primitive, calls, total, cumulative, _ = stats.stats[function]
+            functions.append((function, primitive, calls, total, cumulative))
+
+        with io.StringIO() as stream:
+            stats.stream = stream
+            stats.print_stats(limit)
+            return functions, stream.getvalue()
+
+    def trace_malloc(self, seconds, frames=1, group_by="lineno", limit=30):
+        if not self.session.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+
+        try:
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start(frames)
+            tracemalloc.reset_peak()
+
+            try:
+                before = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+                started = time.perf_counter()
+                time.sleep(seconds)
+                elapsed = time.perf_counter() - started
+                after = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+                traced, peak = tracemalloc.get_traced_memory()
+            finally:
+                if not tracing:
+                    tracemalloc.stop()
+
+            return after.compare_to(before, group_by)[:limit], traced, peak, elapsed
+        finally:
+            self.session.release()
@@ -0,0 +1,1192 @@
+import fnmatch
+import functools
+import math
+import os
+import threading
+import time
+
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from terminal.Extensions.TickCodec import TickCodec
+
+TICK_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("bid", "<f8"),
+        ("ask", "<f8"),
+        ("last", "<f8"),
+        ("volume", "<u8"),
+        ("time_msc", "<i8"),
+        ("flags", "<u4"),
+        ("volume_real", "<f8"),
+    ]
+)
+
+RATE_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("tick_volume", "<u8"),
+        ("spread", "<i4"),
+        ("real_volume", "<u8"),
+    ]
+)
+
+Tick = namedtuple(
+    "Tick", ["time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real"]
+)
+
+BookInfo = namedtuple("BookInfo", ["type", "price", "volume", "volume_dbl"])
+
+TerminalInfo = namedtuple("TerminalInfo", ["connected", "trade_allowed", "name"])
+
+SymbolInfo = namedtuple(
+    "SymbolInfo",
+    [
+        "name",
+        "digits",
+        "point",
+        "trade_tick_size",
+        "trade_tick_value",
+        "volume_min",
+        "volume_step",
+        "bid",
+        "ask",
+        "last",
+        "time",
+    ],
+)
+
+TradePosition = namedtuple(
+    "TradePosition",
+    [
+        "ticket",
+        "time",
+        "time_msc",
+        "time_update",
+        "time_update_msc",
+        "type",
+        "magic",
+        "identifier",
+        "reason",
+        "volume",
+        "price_open",
+        "sl",
+        "tp",
+        "price_current",
+        "swap",
+        "profit",
+        "symbol",
+        "comment",
+        "external_id",
+    ],
+)
+
+TradeOrder = namedtuple(
+    "TradeOrder",
+    [
+        "ticket",
+        "time_setup",
+        "time_setup_msc",
+        "time_done",
+        "time_done_msc",
+        "time_expiration",
+        "type",
+        "type_time",
+        "type_filling",
+        "state",
+        "magic",
+        "position_id",
+        "position_by_id",
+        "reason",
+        "volume_initial",
+        "volume_current",
+        "price_open",
+        "sl",
+        "tp",
+        "price_current",
+        "price_stoplimit",
+        "symbol",
+        "comment",
+        "external_id",
+    ],
+)
+
+TradeDeal = namedtuple(
+    "TradeDeal",
+    [
+        "ticket",
+        "order",
+        "time",
+        "time_msc",
+        "type",
+        "entry",
+        "magic",
+        "position_id",
+        "reason",
+        "volume",
+        "price",
+        "commission",
+        "swap",
+        "profit",
+        "fee",
+        "symbol",
+        "comment",
+        "external_id",
+    ],
+)
+
+OrderSendResult = namedtuple(
+    "OrderSendResult",
+    [
+        "retcode",
+        "deal",
+        "order",
+        "volume",
+        "price",
+        "bid",
+        "ask",
+        "comment",
+        "request_id",
+        "retcode_external",
+        "request",
+    ],
+)
+
+OrderCheckResult = namedtuple(
+    "OrderCheckResult",
+    [
+        "retcode",
+        "balance",
+        "equity",
+        "profit",
+        "margin",
+        "margin_free",
+        "margin_level",
+        "comment",
+        "request",
+    ],
+)
+
+
+def _api(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._outage():
+                self._initialized = False
+                self._error = (Replay.RES_E_INTERNAL_FAIL_CONNECT, "IPC no connection")
+                return None
+            if not self._initialized:
+                self._error = (Replay.RES_E_INTERNAL_FAIL_INIT, "IPC initialize failed")
+                return None
+            self._error = (Replay.RES_S_OK, "Success")
+            self._match_orders()
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class Replay:
+    RES_S_OK = 1
+    RES_E_FAIL = -1
+    RES_E_INVALID_PARAMS = -2
+    RES_E_NO_MEMORY = -3
+    RES_E_NOT_FOUND = -4
+    RES_E_INVALID_VERSION = -5
+    RES_E_AUTH_FAILED = -6
+    RES_E_UNSUPPORTED = -7
+    RES_E_AUTO_TRADING_DISABLED = -8
+    RES_E_INTERNAL_FAIL = -10000
+    RES_E_INTERNAL_FAIL_SEND = -10001
+    RES_E_INTERNAL_FAIL_RECEIVE = -10002
+    RES_E_INTERNAL_FAIL_INIT = -10003
+    RES_E_INTERNAL_FAIL_CONNECT = -10004
+    RES_E_INTERNAL_FAIL_TIMEOUT = -10005
+
+    COPY_TICKS_ALL = -1
+    COPY_TICKS_INFO = 1
+    COPY_TICKS_TRADE = 2
+
+    TICK_FLAG_BID = 0x02
+    TICK_FLAG_ASK = 0x04
+    TICK_FLAG_LAST = 0x08
+    TICK_FLAG_VOLUME = 0x10
+    TICK_FLAG_BUY = 0x20
+    TICK_FLAG_SELL = 0x40
+
+    BOOK_TYPE_SELL = 1
+    BOOK_TYPE_BUY = 2
+    BOOK_TYPE_SELL_MARKET = 3
+    BOOK_TYPE_BUY_MARKET = 4
+
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M2 = 2
+    TIMEFRAME_M3 = 3
+    TIMEFRAME_M4 = 4
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M6 = 6
+    TIMEFRAME_M10 = 10
+    TIMEFRAME_M12 = 12
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_M20 = 20
+    TIMEFRAME_M30 = 30
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H2 = 16386
+    TIMEFRAME_H3 = 16387
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_H6 = 16390
+    TIMEFRAME_H8 = 16392
+    TIMEFRAME_H12 = 16396
+    TIMEFRAME_D1 = 16408
+    TIMEFRAME_W1 = 32769
+    TIMEFRAME_MN1 = 49153
+
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_PENDING = 5
+    TRADE_ACTION_SLTP = 6
+    TRADE_ACTION_MODIFY = 7
+    TRADE_ACTION_REMOVE = 8
+    TRADE_ACTION_CLOSE_BY = 10
+
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    ORDER_TYPE_BUY_LIMIT = 2
+    ORDER_TYPE_SELL_LIMIT = 3
+    ORDER_TYPE_BUY_STOP = 4
+    ORDER_TYPE_SELL_STOP = 5
+
+    ORDER_STATE_PLACED = 1
+    ORDER_STATE_CANCELED = 2
+    ORDER_STATE_FILLED = 4
+
+    ORDER_FILLING_RETURN = 2
+    ORDER_TIME_GTC = 0
+    ORDER_REASON_EXPERT = 3
+    ORDER_REASON_SL = 4
+    ORDER_REASON_TP = 5
+
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+
+    DEAL_TYPE_BUY = 0
+    DEAL_TYPE_SELL = 1
+    DEAL_ENTRY_IN = 0
+    DEAL_ENTRY_OUT = 1
+    DEAL_ENTRY_INOUT = 2
+
+    TRADE_RETCODE_PLACED = 10008
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_INVALID = 10013
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_PRICE_OFF = 10021
+    TRADE_RETCODE_INVALID_ORDER = 10035
+    TRADE_RETCODE_POSITION_CLOSED = 10036
+
+    _SECONDS_PER_TIMEFRAME_UNIT = {0: 60, 1: 3600, 2: 7 * 86400}
+
+    def __init__(
+        self,
+        sources,
+        speed=1.0,
+        latency=0.0,
+        start=None,
+        balance=100000.0,
+        book_depth=10,
+    ):
+        self.speed = speed
+        self.latency = latency
+        self.balance = balance
+        self.book_depth = book_depth
+        self.symbols = {}
+
+        for symbol, source in sources.items():
+            ticks = (
+                source if isinstance(source, np.ndarray) else Replay.load_ticks(source)
+            )
+            self.symbols[symbol.upper()] = Replay.__prepare(ticks)
+
+        first = [
+            s["ticks"]["time_msc"][0] for s in self.symbols.values() if len(s["ticks"])
+        ]
+        last = [
+            s["ticks"]["time_msc"][-1] for s in self.symbols.values() if len(s["ticks"])
+        ]
+        self.start_msc = (
+            Replay.__to_msc(start) if start is not None else min(first, default=0)
+        )
+        self.end_msc = max(last, default=0)
+
+        self._lock = threading.RLock()
+        self._error = (Replay.RES_S_OK, "Success")
+        self._initialized = False
+        self._started = None
+        self._ticket = 0
+        self._positions = {}
+        self._orders = {}
+        self._history_orders = []
+        self._history_deals = []
+        self._matched_msc = self.start_msc
+        self._outage_until = 0.0
+        self._books = set()
+
+    @staticmethod
+    def load_ticks(path):
+        extension = os.path.splitext(path)[1].lower()
+
+        if extension in [".pkl", ".pickle"]:
+            frame = pd.read_pickle(path)
+            time_msc = np.asarray(frame.index, dtype="datetime64[ms]").astype(np.int64)
+            columns = {name: frame[name].to_numpy() for name in frame.columns}
+        elif extension == ".npy":
+            data = np.load(path)
+            columns = {name: data[name] for name in data.dtype.names}
+            time_msc = columns["time_msc"].astype(np.int64)
+        else:
+            with np.load(path) as npz:
+                if TickCodec.is_compact(npz.files):
+                    data = TickCodec.decode({name: npz[name] for name in npz.files})
+                    columns = {name: data[name] for name in data.dtype.names}
+                else:
+                    columns = {
+                        name: npz[name] for name in npz.files if len(npz[name]) > 0
+                    }
+            time_msc = columns["time_msc"].astype(np.int64)
+
+        ticks = np.zeros(len(time_msc), dtype=TICK_DTYPE)
+        ticks["time_msc"] = time_msc
+        ticks["time"] = time_msc // 1000
+        for name in ["bid", "ask", "last", "volume", "flags", "volume_real"]:
+            if name in columns:
+                ticks[name] = columns[name]
+        return ticks
+
+    @staticmethod
+    def __prepare(ticks):
+        ticks = ticks[np.argsort(ticks["time_msc"], kind="stable")]
+
+        def quote(values, fallback):
+            prices = pd.Series(np.where(values > 0, values, np.nan)).ffill()
+            return prices.fillna(pd.Series(fallback)).to_numpy()
+
+        last = pd.Series(np.where(ticks["last"] > 0, ticks["last"], np.nan)).ffill()
+        last = last.bfill().fillna(0).to_numpy()
+        prices = np.unique(np.r_[ticks["bid"], ticks["ask"], ticks["last"]])
+        steps = np.diff(prices[prices > 0])
+
+        return {
+            "ticks": ticks,
+            "last": last,
+            "buy": quote(ticks["ask"], last),
+            "sell": quote(ticks["bid"], last),
+            "tick_size": float(steps[steps > 1e-9].min()) if len(steps) else 0.0,
+        }
+
+    @staticmethod
+    def __to_msc(value):
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=pytz.utc)
+            return int(round(value.timestamp() * 1000))
+        return int(value) * 1000
+
+    def __now_msc(self):
+        if self._started is None:
+            return self.start_msc
+        if self.speed <= 0 or math.isinf(self.speed):
+            return self.end_msc
+        elapsed = time.monotonic() - self._started
+        return min(self.start_msc + int(elapsed * 1000 * self.speed), self.end_msc)
+
+    def __symbol(self, symbol):
+        data = self.symbols.get(str(symbol).upper())
+        if data is None:
+            self._error = (Replay.RES_E_INVALID_PARAMS, "Invalid params")
+        return data
+
+    def __visible(self, data):
+        return int(
+            np.searchsorted(data["ticks"]["time_msc"], self.__now_msc(), "right")
+        )
+
+    def __next_ticket(self):
+        self._ticket += 1
+        return self._ticket
+
+    # terminal
+
+    def _outage(self):
+        return time.monotonic() < self._outage_until
+
+    def disconnect(self, seconds):
+        # simulates the terminal dropping the IPC connection for a while
+        with self._lock:
+            self._outage_until = time.monotonic() + seconds
+
+    def initialize(self, *args, **kwargs):
+        with self._lock:
+            if self._outage():
+                self._error = (Replay.RES_E_INTERNAL_FAIL_INIT, "IPC initialize failed")
+                return False
+            self._initialized = True
+            if self._started is None:
+                self._started = time.monotonic()
+            self._error = (Replay.RES_S_OK, "Success")
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            self._initialized = False
+            return True
+
+    def last_error(self):
+        return self._error
+
+    def version(self):
+        return (500, 4288, "replay")
+
+    @_api
+    def terminal_info(self):
+        return TerminalInfo(connected=True, trade_allowed=True, name="replay")
+
+    # market data
+
+    @_api
+    def symbol_info(self, symbol):
+        data = self.__symbol(symbol)
+        if data is None:
+            return None
+
+        tick = self.__tick(data)
+        tick_size = data["tick_size"]
+        digits = max(0, -int(math.floor(math.log10(tick_size)))) if tick_size else 0
+        return SymbolInfo(
+            name=str(symbol).upper(),
+            digits=digits,
+            point=tick_size,
+            trade_tick_size=tick_size,
+            trade_tick_value=tick_size,
+            volume_min=1.0,
+            volume_step=1.0,
+            bid=tick.bid if tick else 0.0,
+            ask=tick.ask if tick else 0.0,
+            last=tick.last if tick else 0.0,
+            time=tick.time if tick else 0,
+        )
+
+    def __tick(self, data):
+        index = self.__visible(data) - 1
+        if index < 0:
+            return None
+
+        tick = data["ticks"][index]
+        return Tick(
+            time=int(tick["time"]),
+            bid=float(data["sell"][index]),
+            ask=float(data["buy"][index]),
+            last=float(data["last"][index]),
+            volume=int(tick["volume"]),
+            time_msc=int(tick["time_msc"]),
+            flags=int(tick["flags"]),
+            volume_real=float(tick["volume_real"]),
+        )
+
+    @_api
+    def symbol_info_tick(self, symbol):
+        data = self.__symbol(symbol)
+        if data is None:
+            return None
+
+        tick = self.__tick(data)
+        if tick is None:
+            self._error = (Replay.RES_E_NOT_FOUND, "No history")
+        return tick
+
+    @_api
+    def market_book_add(self, symbol):
+        if self.__symbol(symbol) is None:
+            return False
+        self._books.add(str(symbol).upper())
+        return True
+
+    @_api
+    def market_book_release(self, symbol):
+        self._books.discard(str(symbol).upper())
+        return True
+
+    @_api
+    def market_book_get(self, symbol):
+        data = self.__symbol(symbol)
+        if data is None:
+            return None
+
+        if str(symbol).upper() not in self._books:
+            self._error = (Replay.RES_E_FAIL, "Market book not subscribed")
+            return None
+
+        tick = self.__tick(data)
+        if tick is None:
+            return ()
+
+        # levels follow the replayed quote, volumes of a few levels change every 100ms
+        depth = self.book_depth
+        step = data["tick_size"] or 1.0
+        bucket = int((time.monotonic() - self._started) * 10)
+        volumes = np.random.default_rng(tick.time_msc).integers(1, 100, 2 * depth)
+        rng = np.random.default_rng([tick.time_msc, bucket])
+        changed = rng.random(2 * depth) < 0.2
+        volumes = np.where(changed, rng.integers(1, 100, 2 * depth), volumes)
+
+        sells = tick.ask + step * np.arange(depth)[::-1]
+        buys = tick.bid - step * np.arange(depth)
+
+        return tuple(
+            BookInfo(
+                type=book_type,
+                price=float(price),
+                volume=int(volume),
+                volume_dbl=float(volume),
+            )
+            for book_type, price, volume in zip(
+                [Replay.BOOK_TYPE_SELL] * depth + [Replay.BOOK_TYPE_BUY] * depth,
+                np.r_[sells, buys],
+                volumes,
+            )
+        )
+
+    @_api
+    def copy_ticks_range(self, symbol, date_from, date_to, flags):
+        data = self.__symbol(symbol)
+        if data is None:
+            return None
+
+        ticks = data["ticks"]
+        times = ticks["time_msc"]
+        begin = int(np.searchsorted(times, Replay.__to_msc(date_from), "left"))
+        end = min(
+            int(np.searchsorted(times, Replay.__to_msc(date_to), "right")),
+            self.__visible(data),
+        )
+        ticks = ticks[begin : max(begin, end)]
+
+        if flags == Replay.COPY_TICKS_TRADE:
+            ticks = ticks[(ticks["flags"] & Replay.TICK_FLAG_LAST) != 0]
+        elif flags == Replay.COPY_TICKS_INFO:
+            ticks = ticks[
+                (ticks["flags"] & (Replay.TICK_FLAG_BID | Replay.TICK_FLAG_ASK)) != 0
+            ]
+
+        return ticks.copy()
+
+    @_api
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        data = self.__symbol(symbol)
+        if data is None:
+            return None
+
+        unit = Replay._SECONDS_PER_TIMEFRAME_UNIT.get(int(timeframe) >> 14)
+        if unit is None:
+            self._error = (Replay.RES_E_INVALID_PARAMS, "Invalid params")
+            return None
+        seconds = (int(timeframe) & 0x3FFF) * unit
+
+        ticks = self.copy_ticks_range.__wrapped__(
+            self, symbol, date_from, date_to, Replay.COPY_TICKS_TRADE
+        )
+        rates = np.zeros(0, dtype=RATE_DTYPE)
+        if len(ticks) == 0:
+            return rates
+
+        buckets = ticks["time"] // seconds * seconds
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(ticks)]
+
+        rates = np.zeros(len(starts), dtype=RATE_DTYPE)
+        rates["time"] = buckets[starts]
+        rates["open"] = ticks["last"][starts]
+        rates["high"] = np.maximum.reduceat(ticks["last"], starts)
+        rates["low"] = np.minimum.reduceat(ticks["last"], starts)
+        rates["close"] = ticks["last"][ends - 1]
+        rates["tick_volume"] = ends - starts
+        rates["real_volume"] = np.add.reduceat(ticks["volume_real"], starts)
+        return rates
+
+    # trading
+
+    def __matches(self, group, symbol):
+        if group is None:
+            return True
+
+        matched = False
+        for pattern in str(group).split(","):
+            pattern = pattern.strip()
+            if pattern.startswith("!"):
+                if fnmatch.fnmatchcase(symbol, pattern[1:].upper()):
+                    return False
+            elif fnmatch.fnmatchcase(symbol, pattern.upper()):
+                matched = True
+        return matched
+
+    def __select(self, items, symbol=None, group=None, ticket=None):
+        return tuple(
+            item
+            for item in items
+            if (symbol is None or item.symbol == str(symbol).upper())
+            and (ticket is None or item.ticket == int(ticket))
+            and self.__matches(group, item.symbol)
+        )
+
+    def __current_position(self, position):
+        data = self.symbols[position.symbol]
+        index = self.__visible(data) - 1
+        direction = 1 if position.type == Replay.POSITION_TYPE_BUY else -1
+        price = float((data["sell"] if direction == 1 else data["buy"])[max(index, 0)])
+        return position._replace(
+            price_current=price,
+            profit=Replay.__profit(
+                direction, position.volume, position.price_open, price
+            ),
+        )
+
+    @staticmethod
+    def __profit(direction, volume, price_open, price_close):
+        # trade_tick_value equals trade_tick_size, one price unit is one unit of balance
+        return direction * (price_close - price_open) * volume
+
+    @_api
+    def positions_get(self, symbol=None, group=None, ticket=None):
+        return self.__select(
+            [self.__current_position(p) for p in self._positions.values()],
+            symbol,
+            group,
+            ticket,
+        )
+
+    @_api
+    def orders_get(self, symbol=None, group=None, ticket=None):
+        return self.__select(self._orders.values(), symbol, group, ticket)
+
+    def __history(self, items, time_field, args, group, ticket, position):
+        if ticket is not None:
+            return tuple(item for item in items if item.ticket == int(ticket))
+        if position is not None:
+            return tuple(item for item in items if item.position_id == int(position))
+        if len(args) >= 2:
+            date_from, date_to = Replay.__to_msc(args[0]), Replay.__to_msc(args[1])
+            items = [
+                item
+                for item in items
+                if date_from <= getattr(item, time_field) <= date_to
+            ]
+        return self.__select(items, group=group)
+
+    @_api
+    def history_orders_get(self, *args, group=None, ticket=None, position=None):
+        return self.__history(
+            self._history_orders, "time_setup_msc", args, group, ticket, position
+        )
+
+    @_api
+    def history_deals_get(self, *args, group=None, ticket=None, position=None):
+        return self.__history(
+            self._history_deals, "time_msc", args, group, ticket, position
+        )
+
+    @_api
+    def order_check(self, request):
+        profit = sum(
+            self.__current_position(p).profit for p in self._positions.values()
+        )
+        retcode = (
+            0
+            if self.__symbol(request.get("symbol", "")) is not None
+            else Replay.TRADE_RETCODE_INVALID
+        )
+        return OrderCheckResult(
+            retcode=retcode,
+            balance=self.balance,
+            equity=self.balance + profit,
+            profit=profit,
+            margin=0.0,
+            margin_free=self.balance + profit,
+            margin_level=0.0,
+            comment="Done" if retcode == 0 else "Invalid request",
+            request=request,
+        )
+
+    @_api
+    def order_send(self, request):
+        action = request.get("action")
+
+        if action == Replay.TRADE_ACTION_DEAL:
+            return self.__send_deal(request)
+        if action == Replay.TRADE_ACTION_PENDING:
+            return self.__send_pending(request)
+        if action == Replay.TRADE_ACTION_SLTP:
+            return self.__send_sltp(request)
+        if action == Replay.TRADE_ACTION_MODIFY:
+            return self.__send_modify(request)
+        if action == Replay.TRADE_ACTION_REMOVE:
+            return self.__send_remove(request)
+
+        return self.__result(
+            Replay.TRADE_RETCODE_INVALID, request, "Unsupported action"
+        )
+
+    def __result(
+        self, retcode, request, comment, deal=0, order=0, volume=0.0, price=0.0
+    ):
+        tick = None
+        data = self.symbols.get(str(request.get("symbol", "")).upper())
+        if data is not None:
+            tick = self.__tick(data)
+        return OrderSendResult(
+            retcode=retcode,
+            deal=deal,
+            order=order,
+            volume=volume,
+            price=price,
+            bid=tick.bid if tick else 0.0,
+            ask=tick.ask if tick else 0.0,
+            comment=comment,
+            request_id=self.__next_ticket(),
+            retcode_external=0,
+            request=request,
+        )
+
+    def __send_deal(self, request):
+        data = self.__symbol(request.get("symbol", ""))
+        if data is None or request.get("volume", 0) <= 0:
+            return self.__result(
+                Replay.TRADE_RETCODE_INVALID_VOLUME, request, "Invalid"
+            )
+
+        tick = self.__tick(data)
+        if tick is None:
+            return self.__result(Replay.TRADE_RETCODE_PRICE_OFF, request, "No prices")
+
+        buy = request.get("type") == Replay.ORDER_TYPE_BUY
+        price = tick.ask if buy else tick.bid
+        order, deal = self.__fill(
+            str(request["symbol"]).upper(),
+            Replay.ORDER_TYPE_BUY if buy else Replay.ORDER_TYPE_SELL,
+            float(request["volume"]),
+            price,
+            tick.time_msc,
+            request.get("magic", 0),
+            request.get("comment", ""),
+            Replay.ORDER_REASON_EXPERT,
+        )
+        return self.__result(
+            Replay.TRADE_RETCODE_DONE,
+            request,
+            "Request executed",
+            deal=deal.ticket,
+            order=order.ticket,
+            volume=deal.volume,
+            price=price,
+        )
+
+    def __fill(
+        self,
+        symbol,
+        order_type,
+        volume,
+        price,
+        time_msc,
+        magic,
+        comment,
+        reason,
+        order=None,
+    ):
+        if order is None:
+            order = TradeOrder(
+                ticket=self.__next_ticket(),
+                time_setup=time_msc // 1000,
+                time_setup_msc=time_msc,
+                time_done=0,
+                time_done_msc=0,
+                time_expiration=0,
+                type=order_type,
+                type_time=Replay.ORDER_TIME_GTC,
+                type_filling=Replay.ORDER_FILLING_RETURN,
+                state=Replay.ORDER_STATE_PLACED,
+                magic=magic,
+                position_id=0,
+                position_by_id=0,
+                reason=reason,
+                volume_initial=volume,
+                volume_current=volume,
+                price_open=price,
+                sl=0.0,
+                tp=0.0,
+                price_current=price,
+                price_stoplimit=0.0,
+                symbol=symbol,
+                comment=comment,
+                external_id="",
+            )
+
+        buy = order_type in [
+            Replay.ORDER_TYPE_BUY,
+            Replay.ORDER_TYPE_BUY_LIMIT,
+            Replay.ORDER_TYPE_BUY_STOP,
+        ]
+        direction = 1 if buy else -1
+        position = self._positions.get(symbol)
+        profit = 0.0
+        entry = Replay.DEAL_ENTRY_IN
+
+        if position is None:
+            position = self.__open_position(
+                symbol,
+                direction,
+                volume,
+                price,
+                time_msc,
+                magic,
+                comment,
+                order.sl,
+                order.tp,
+            )
+        else:
+            held = (
+                position.volume
+                if position.type == Replay.POSITION_TYPE_BUY
+                else -position.volume
+            )
+            net = held + direction * volume
+
+            if held * direction > 0:
+                average = (position.price_open * position.volume + price * volume) / (
+                    position.volume + volume
+                )
+                position = position._replace(
+                    volume=position.volume + volume,
+                    price_open=average,
+                    time_update=time_msc // 1000,
+                    time_update_msc=time_msc,
+                )
+            else:
+                closed = min(abs(held), volume)
+                profit = Replay.__profit(-direction, closed, position.price_open, price)
+                self.balance += profit
+                entry = Replay.DEAL_ENTRY_OUT
+
+                if net == 0:
+                    position = position._replace(volume=0.0)
+                elif net * held > 0:
+                    position = position._replace(
+                        volume=abs(net),
+                        time_update=time_msc // 1000,
+                        time_update_msc=time_msc,
+                    )
+                else:
+                    entry = Replay.DEAL_ENTRY_INOUT
+                    position = position._replace(
+                        type=(
+                            Replay.POSITION_TYPE_BUY
+                            if net > 0
+                            else Replay.POSITION_TYPE_SELL
+                        ),
+                        volume=abs(net),
+                        price_open=price,
+                        sl=order.sl,
+                        tp=order.tp,
+                        time_update=time_msc // 1000,
+                        time_update_msc=time_msc,
+                    )
+
+        if position.volume == 0:
+            self._positions.pop(symbol, None)
+        else:
+            self._positions[symbol] = position
+
+        order = order._replace(
+            state=Replay.ORDER_STATE_FILLED,
+            time_done=time_msc // 1000,
+            time_done_msc=time_msc,
+            volume_current=0.0,
+            price_current=price,
+            position_id=position.identifier,
+        )
+        deal = TradeDeal(
+            ticket=self.__next_ticket(),
+            order=order.ticket,
+            time=time_msc // 1000,
+            time_msc=time_msc,
+            type=Replay.DEAL_TYPE_BUY if buy else Replay.DEAL_TYPE_SELL,
+            entry=entry,
+            magic=magic,
+            position_id=position.identifier,
+            reason=reason,
+            volume=volume,
+            price=price,
+            commission=0.0,
+            swap=0.0,
+            profit=profit,
+            fee=0.0,
+            symbol=symbol,
+            comment=comment,
+            external_id="",
+        )
+        self._history_orders.append(order)
+        self._history_deals.append(deal)
+        return order, deal
+
+    def __open_position(
+        self, symbol, direction, volume, price, time_msc, magic, comment, sl=0.0, tp=0.0
+    ):
+        ticket = self.__next_ticket()
+        return TradePosition(
+            ticket=ticket,
+            time=time_msc // 1000,
+            time_msc=time_msc,
+            time_update=time_msc // 1000,
+            time_update_msc=time_msc,
+            type=(
+                Replay.POSITION_TYPE_BUY if direction > 0 else Replay.POSITION_TYPE_SELL
+            ),
+            magic=magic,
+            identifier=ticket,
+            reason=Replay.ORDER_REASON_EXPERT,
+            volume=volume,
+            price_open=price,
+            sl=sl,
+            tp=tp,
+            price_current=price,
+            swap=0.0,
+            profit=0.0,
+            symbol=symbol,
+            comment=comment,
+            external_id="",
+        )
+
+    def __send_pending(self, request):
+        data = self.__symbol(request.get("symbol", ""))
+        if data is None or request.get("volume", 0) <= 0:
+            return self.__result(
+                Replay.TRADE_RETCODE_INVALID_VOLUME, request, "Invalid"
+            )
+        if request.get("type") not in [
+            Replay.ORDER_TYPE_BUY_LIMIT,
+            Replay.ORDER_TYPE_SELL_LIMIT,
+            Replay.ORDER_TYPE_BUY_STOP,
+            Replay.ORDER_TYPE_SELL_STOP,
+        ]:
+            return self.__result(
+                Replay.TRADE_RETCODE_INVALID_ORDER, request, "Invalid order"
+            )
+
+        time_msc = self.__now_msc()
+        order = TradeOrder(
+            ticket=self.__next_ticket(),
+            time_setup=time_msc // 1000,
+            time_setup_msc=time_msc,
+            time_done=0,
+            time_done_msc=0,
+            time_expiration=0,
+            type=request["type"],
+            type_time=request.get("type_time", Replay.ORDER_TIME_GTC),
+            type_filling=request.get("type_filling", Replay.ORDER_FILLING_RETURN),
+            state=Replay.ORDER_STATE_PLACED,
+            magic=request.get("magic", 0),
+            position_id=0,
+            position_by_id=0,
+            reason=Replay.ORDER_REASON_EXPERT,
+            volume_initial=float(request["volume"]),
+            volume_current=float(request["volume"]),
+            price_open=float(request.get("price", 0.0)),
+            sl=float(request.get("sl", 0.0)),
+            tp=float(request.get("tp", 0.0)),
+            price_current=float(request.get("price", 0.0)),
+            price_stoplimit=float(request.get("stoplimit", 0.0)),
+            symbol=str(request["symbol"]).upper(),
+            comment=request.get("comment", ""),
+            external_id="",
+        )
+        self._orders[order.ticket] = order
+        return self.__result(
+            Replay.TRADE_RETCODE_PLACED,
+            request,
+            "Request executed",
+            order=order.ticket,
+            volume=order.volume_initial,
+            price=order.price_open,
+        )
+
+    def __send_sltp(self, request):
+        ticket = int(request.get("position", 0))
+        symbol = str(request.get("symbol", "")).upper()
+        position = next(
+            (
+                p
+                for p in self._positions.values()
+                if (p.ticket == ticket if ticket else p.symbol == symbol)
+            ),
+            None,
+        )
+        if position is None:
+            return self.__result(
+                Replay.TRADE_RETCODE_POSITION_CLOSED, request, "Position closed"
+            )
+
+        self._positions[position.symbol] = position._replace(
+            sl=float(request.get("sl", position.sl)),
+            tp=float(request.get("tp", position.tp)),
+        )
+        return self.__result(Replay.TRADE_RETCODE_DONE, request, "Request executed")
+
+    def __send_modify(self, request):
+        order = self._orders.get(int(request.get("order", 0)))
+        if order is None:
+            return self.__result(
+                Replay.TRADE_RETCODE_INVALID_ORDER, request, "Invalid order"
+            )
+
+        self._orders[order.ticket] = order._replace(
+            price_open=float(request.get("price", order.price_open)),
+            sl=float(request.get("sl", order.sl)),
+            tp=float(request.get("tp", order.tp)),
+        )
+        return self.__result(
+            Replay.TRADE_RETCODE_DONE, request, "Request executed", order=order.ticket
+        )
+
+    def __send_remove(self, request):
+        order = self._orders.pop(int(request.get("order", 0)), None)
+        if order is None:
+            return self.__result(
+                Replay.TRADE_RETCODE_INVALID_ORDER, request, "Invalid order"
+            )
+
+        time_msc = self.__now_msc()
+        self._history_orders.append(
+            order._replace(
+                state=Replay.ORDER_STATE_CANCELED,
+                time_done=time_msc // 1000,
+                time_done_msc=time_msc,
+            )
+        )
+        return self.__result(
+            Replay.TRADE_RETCODE_DONE, request, "Request executed", order=order.ticket
+        )
+
+    def __triggers(self, begin, end):
+        # earliest tick index at which each pending order or stop loss/take profit fires
+        triggers = []
+
+        for order in self._orders.values():
+            data = self.symbols[order.symbol]
+            window = slice(begin[order.symbol], end[order.symbol])
+            if order.type == Replay.ORDER_TYPE_BUY_LIMIT:
+                mask = data["buy"][window] <= order.price_open
+            elif order.type == Replay.ORDER_TYPE_SELL_LIMIT:
+                mask = data["sell"][window] >= order.price_open
+            elif order.type == Replay.ORDER_TYPE_BUY_STOP:
+                mask = data["buy"][window] >= order.price_open
+            else:
+                mask = data["sell"][window] <= order.price_open
+            if mask.any():
+                triggers.append(
+                    (
+                        window.start + int(mask.argmax()),
+                        "order",
+                        order,
+                        order.price_open,
+                    )
+                )
+
+        for position in self._positions.values():
+            data = self.symbols[position.symbol]
+            window = slice(begin[position.symbol], end[position.symbol])
+            if position.type == Replay.POSITION_TYPE_BUY:
+                prices = data["sell"][window]
+                stops = [("sl", prices <= position.sl), ("tp", prices >= position.tp)]
+            else:
+                prices = data["buy"][window]
+                stops = [("sl", prices >= position.sl), ("tp", prices <= position.tp)]
+            for kind, mask in stops:
+                price = getattr(position, kind)
+                if price > 0 and mask.any():
+                    triggers.append(
+                        (window.start + int(mask.argmax()), kind, position, price)
+                    )
+
+        return triggers
+
+    def _match_orders(self):
+        now_msc = self.__now_msc()
+
+        if self._started is None or (
+            len(self._orders) == 0 and len(self._positions) == 0
+        ):
+            self._matched_msc = now_msc
+            return
+
+        begin = {
+            symbol: int(
+                np.searchsorted(data["ticks"]["time_msc"], self._matched_msc, "right")
+            )
+            for symbol, data in self.symbols.items()
+        }
+        end = {
+            symbol: int(np.searchsorted(data["ticks"]["time_msc"], now_msc, "right"))
+            for symbol, data in self.symbols.items()
+        }
+
+        triggers = self.__triggers(begin, end)
+        while len(triggers) > 0:
+            # indices belong to each symbol's own ticks, fills are ordered by tick time
+            index, kind, item, price = min(
+                triggers,
+                key=lambda trigger: (
+                    self.symbols[trigger[2].symbol]["ticks"]["time_msc"][trigger[0]],
+                    trigger[0],
+                ),
+            )
+            time_msc = int(self.symbols[item.symbol]["ticks"]["time_msc"][index])
+
+            if kind == "order":
+                self._orders.pop(item.ticket)
+                self.__fill(
+                    item.symbol,
+                    item.type,
+                    item.volume_current,
+                    price,
+                    time_msc,
+                    item.magic,
+                    item.comment,
+                    item.reason,
+                    order=item,
+                )
+            else:
+                self.__fill(
+                    item.symbol,
+                    (
+                        Replay.ORDER_TYPE_SELL
+                        if item.type == Replay.POSITION_TYPE_BUY
+                        else Replay.ORDER_TYPE_BUY
+                    ),
+                    item.volume,
+                    price,
+                    time_msc,
+                    item.magic,
+                    item.comment,
+                    Replay.ORDER_REASON_SL if kind == "sl" else Replay.ORDER_REASON_TP,
+                )
+
+            begin[item.symbol] = index
+            triggers = self.__triggers(begin, end)
+
+        self._matched_msc = now_msc
@@ -0,0 +1,158 @@
+import io
+import json
+
+import numpy as np
+
+_VERSION = 1
+_META = "__meta__"
+_PRICE_FIELDS = ["bid", "ask", "last"]
+_TIME_FIELDS = ["time", "time_msc"]
+_SIGNED = [np.int8, np.int16, np.int32, np.int64]
+_UNSIGNED = [np.uint8, np.uint16, np.uint32, np.uint64]
+
+
+class TickCodec:
+
+    @staticmethod
+    def smallest(values):
+        if len(values) == 0:
+            return values.astype(np.int8)
+
+        low, high = int(values.min()), int(values.max())
+        for dtype in _UNSIGNED if low >= 0 else _SIGNED:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype)
+        return values
+
+    @staticmethod
+    def __delta(values):
+        values = values.astype(np.int64)
+        if len(values) == 0:
+            return {"encoding": "delta", "base": 0}, np.zeros(0, dtype=np.int8)
+        return {"encoding": "delta", "base": int(values[0])}, TickCodec.smallest(
+            np.diff(values)
+        )
+
+    @staticmethod
+    def __price(values, tick_size):
+        if tick_size <= 0:
+            return None
+
+        if tick_size >= 1:
+            scale = {"step": tick_size}
+            steps = np.rint(values / tick_size)
+            restored = steps * tick_size
+        else:
+            # dividing by an integer keeps decimal prices such as 5.12 exact
+            divisor = round(1 / tick_size)
+            scale = {"divisor": divisor}
+            steps = np.rint(values * divisor)
+            restored = steps / divisor
+
+        if not np.array_equal(restored, values) or np.abs(steps).max(initial=0) >= 2**31:
+            return None
+
+        meta, deltas = TickCodec.__delta(steps.astype(np.int32))
+        meta.update(scale, encoding="ticks")
+        return meta, deltas
+
+    @staticmethod
+    def encode(ticks, tick_size=0.0):
+        ticks = np.asarray(ticks)
+        names = ticks.dtype.names
+        arrays = {}
+        fields = []
+
+        for name in names:
+            values = ticks[name]
+            meta, stored = None, None
+
+            if (
+                name == "time"
+                and "time_msc" in names
+                and np.array_equal(values, ticks["time_msc"] // 1000)
+            ):
+                meta = {"encoding": "derived"}
+            elif name in _TIME_FIELDS:
+                meta, stored = TickCodec.__delta(values)
+            elif np.issubdtype(values.dtype, np.floating):
+                encoded = (
+                    TickCodec.__price(values, tick_size) if name in _PRICE_FIELDS else None
+                )
+                if encoded is not None:
+                    meta, stored = encoded
+                elif np.array_equal(np.rint(values), values) and (
+                    np.abs(values).max(initial=0) < 2**53
+                ):
+                    meta, stored = {"encoding": "integer"}, TickCodec.smallest(
+                        values.astype(np.int64)
+                    )
+            elif np.issubdtype(values.dtype, np.integer):
+                meta, stored = {"encoding": "integer"}, TickCodec.smallest(values)
+
+            if meta is None:
+                meta, stored = {"encoding": "raw"}, values
+
+            meta.update(name=name, dtype=values.dtype.str)
+            fields.append(meta)
+            if stored is not None:
+                arrays[name] = stored
+
+        header = {"version": _VERSION, "count": len(ticks), "fields": fields}
+        arrays[_META] = np.frombuffer(json.dumps(header).encode(), dtype=np.uint8)
+        return arrays
+
+    @staticmethod
+    def decode(arrays):
+        header = json.loads(bytes(arrays[_META]).decode())
+        dtype = np.dtype([(field["name"], field["dtype"]) for field in header["fields"]])
+        ticks = np.zeros(header["count"], dtype=dtype)
+
+        for field in header["fields"]:
+            name, encoding = field["name"], field["encoding"]
+
+            if encoding == "derived":
+                continue
+
+            values = arrays[name]
+            if encoding in ["delta", "ticks"] and header["count"] > 0:
+                values = np.concatenate(
+                    [[field["base"]], field["base"] + np.cumsum(values, dtype=np.int64)]
+                )
+                if encoding == "ticks":
+                    values = (
+                        values * field["step"]
+                        if "step" in field
+                        else values / field["divisor"]
+                    )
+            ticks[name] = values
+
+        for field in header["fields"]:
+            if field["encoding"] == "derived":
+                ticks[field["name"]] = ticks["time_msc"] // 1000
+
+        return ticks
+
+    @staticmethod
+    def write(file, ticks, tick_size=0.0):
+        np.savez_compressed(file, **TickCodec.encode(ticks, tick_size))
+
+    @staticmethod
+    def read(file):
+        with np.load(file) as npz:
+            return TickCodec.decode({name: npz[name] for name in npz.files})
+
+    @staticmethod
+    def dumps(ticks, tick_size=0.0):
+        with io.BytesIO() as bytesIO:
+            TickCodec.write(bytesIO, ticks, tick_size)
+            return bytesIO.getvalue()
+
+    @staticmethod
+    def loads(data):
+        return TickCodec.read(io.BytesIO(data))
+
+    @staticmethod
+    def is_compact(names):
+        return _META in names
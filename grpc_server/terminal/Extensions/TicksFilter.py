@@ -0,0 +1,72 @@
+import numpy as np
+
+_PRICE_FIELDS = ["bid", "ask", "last"]
+
+
+class TicksFilter:
+
+    @staticmethod
+    def validate(filter):
+        if filter.priceField and filter.priceField not in _PRICE_FIELDS:
+            raise ValueError(f"priceField must be one of {', '.join(_PRICE_FIELDS)}")
+
+        decimation = filter.WhichOneof("decimation")
+        if decimation is not None and getattr(filter, decimation) < 0:
+            raise ValueError(f"{decimation} must not be negative")
+
+    @staticmethod
+    def mask(ticks, filter):
+        mask = np.ones(len(ticks), dtype=bool)
+
+        if filter.flagsMask != 0:
+            mask &= (ticks["flags"] & filter.flagsMask) != 0
+
+        if filter.HasField("minVolume"):
+            mask &= ticks["volume_real"] >= filter.minVolume.value
+
+        prices = ticks[filter.priceField or "last"]
+
+        if filter.HasField("minPrice"):
+            mask &= prices >= filter.minPrice.value
+
+        if filter.HasField("maxPrice"):
+            mask &= prices <= filter.maxPrice.value
+
+        return mask
+
+    @staticmethod
+    def dedupe(ticks, fields):
+        changed = np.ones(len(ticks), dtype=bool)
+        if len(ticks) < 2:
+            return changed
+
+        changed[1:] = False
+        for field in fields:
+            changed[1:] |= ticks[field][1:] != ticks[field][:-1]
+
+        return changed
+
+    @staticmethod
+    def decimate(times, filter):
+        decimation = filter.WhichOneof("decimation")
+
+        if decimation == "lastPerMs" and filter.lastPerMs > 0 and len(times) > 0:
+            buckets = times // filter.lastPerMs
+            return np.r_[buckets[1:] != buckets[:-1], True]
+
+        if decimation == "everyNth" and filter.everyNth > 1:
+            return slice(None, None, filter.everyNth)
+
+        return slice(None)
+
+    @staticmethod
+    def select(ticks, filter, returnFields=None):
+        # indices of the masked ticks kept by dedupe and decimation, both start over
+        # at the first tick, so a resumed stream restarts them at the last tick sent
+        index = np.arange(len(ticks))
+
+        if filter.dedupeQuotes:
+            fields = [field for field in _PRICE_FIELDS if field in (returnFields or [])]
+            index = index[TicksFilter.dedupe(ticks, fields or _PRICE_FIELDS)]
+
+        return index[TicksFilter.decimate(ticks["time_msc"][index], filter)]
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+
+class TimeBars:
+
+    def __init__(self, timeframe, times, prices, volume):
+        self.timeframe = pd.Timedelta(timeframe).value
+        self.bars = []
+
+        if len(times) == 0:
+            return
+
+        times = np.asarray(pd.to_datetime(times), dtype="datetime64[ns]").view(np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        volume = np.asarray(volume, dtype=np.float64)
+
+        buckets = times // self.timeframe
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(prices)]
+
+        opens = prices[starts]
+        highs = np.maximum.reduceat(prices, starts)
+        lows = np.minimum.reduceat(prices, starts)
+        closes = prices[ends - 1]
+        volumes = np.add.reduceat(volume, starts)
+        times = pd.to_datetime(buckets[starts] * self.timeframe, unit="ns")
+
+        self.bars = [
+            {
+                "time": times[i],
+                "type": "closed",
+                "open": float(opens[i]),
+                "high": float(highs[i]),
+                "low": float(lows[i]),
+                "close": float(closes[i]),
+                "ticks_count": int(ends[i] - starts[i]),
+                "volume": float(volumes[i]),
+            }
+            for i in range(len(starts))
+        ]
+        self.bars[-1]["type"] = "last"
+
+    def check_new_price(self, time, price, volume):
+        bucket_time = pd.Timestamp(
+            pd.Timestamp(time).value // self.timeframe * self.timeframe, unit="ns"
+        )
+
+        if len(self.bars) > 0 and self.bars[-1]["time"] == bucket_time:
+            last = self.bars[-1]
+            last["high"] = max(last["high"], price)
+            last["low"] = min(last["low"], price)
+            last["close"] = price
+            last["ticks_count"] += 1
+            last["volume"] += volume
+            return
+
+        if len(self.bars) > 0:
+            self.bars[-1]["type"] = "closed"
+
+        self.bars.append(
+            {
+                "time": bucket_time,
+                "type": "last",
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "ticks_count": 1,
+                "volume": volume,
+            }
+        )
@@ -0,0 +1,117 @@
+import numpy as np
+
+DEAL_DTYPE = np.dtype(
+    [
+        ("ticket", "<i8"),
+        ("time_msc", "<i8"),
+        ("type", "<i4"),
+        ("entry", "<i4"),
+        ("magic", "<i8"),
+        ("position_id", "<i8"),
+        ("volume", "<f8"),
+        ("price", "<f8"),
+        ("commission", "<f8"),
+        ("swap", "<f8"),
+        ("profit", "<f8"),
+        ("fee", "<f8"),
+        ("symbol", "<U32"),
+    ]
+)
+
+_DEAL_TYPE_BUY = 0
+_DEAL_TYPE_SELL = 1
+_DEAL_TYPE_COMMISSION = [7, 8, 9, 10, 11]
+_DEAL_ENTRY_OUT = [1, 2, 3]
+
+
+class TradeAnalytics:
+
+    @staticmethod
+    def deals(result):
+        deals = np.array(
+            [
+                (
+                    deal.ticket,
+                    deal.time_msc,
+                    deal.type,
+                    deal.entry,
+                    deal.magic,
+                    deal.position_id,
+                    deal.volume,
+                    deal.price,
+                    deal.commission,
+                    deal.swap,
+                    deal.profit,
+                    deal.fee,
+                    deal.symbol,
+                )
+                for deal in result or []
+            ],
+            dtype=DEAL_DTYPE,
+        )
+        return deals[np.argsort(deals["time_msc"], kind="stable")]
+
+    @staticmethod
+    def trading(deals):
+        # balance, credit and bonus operations are not trading results
+        trade = np.isin(deals["type"], [_DEAL_TYPE_BUY, _DEAL_TYPE_SELL])
+        charges = np.isin(deals["type"], _DEAL_TYPE_COMMISSION)
+        return deals[trade | charges], trade[trade | charges]
+
+    @staticmethod
+    def stats(deals, trade, inverse=None, count=1):
+        if inverse is None:
+            inverse = np.zeros(len(deals), dtype=np.intp)
+
+        def total(weights):
+            return np.bincount(inverse, weights=weights, minlength=count)
+
+        # commission deals book the charge as profit
+        profit = np.where(trade, deals["profit"], 0.0)
+        commission = deals["commission"] + np.where(trade, 0.0, deals["profit"])
+        exits = trade & np.isin(deals["entry"], _DEAL_ENTRY_OUT)
+
+        stats = {
+            "deals": total(trade.astype(np.float64)).astype(np.int64),
+            "trades": total(exits.astype(np.float64)).astype(np.int64),
+            "wins": total((exits & (profit > 0)).astype(np.float64)).astype(np.int64),
+            "volume": total(np.where(trade, deals["volume"], 0.0)),
+            "profit": total(profit),
+            "commission": total(commission),
+            "swap": total(deals["swap"]),
+            "fee": total(deals["fee"]),
+        }
+        stats["net"] = stats["profit"] + stats["commission"] + stats["swap"] + stats["fee"]
+        return stats
+
+    @staticmethod
+    def breakdown(deals, trade, field):
+        keys, inverse = np.unique(deals[field], return_inverse=True)
+        return keys, TradeAnalytics.stats(deals, trade, inverse, len(keys))
+
+    @staticmethod
+    def net(deals):
+        return deals["profit"] + deals["commission"] + deals["swap"] + deals["fee"]
+
+    @staticmethod
+    def equity(deals, bucket_msc):
+        # one entry per bucket with deals, equity is the cumulative net result
+        if len(deals) == 0:
+            empty = np.zeros(0)
+            return np.zeros(0, dtype=np.int64), empty, empty, empty, 0.0
+
+        equity = np.cumsum(TradeAnalytics.net(deals))
+        peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+        drawdown = peak - equity
+
+        buckets = deals["time_msc"] // bucket_msc
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(deals)] - 1
+
+        return (
+            buckets[starts] * bucket_msc,
+            np.diff(np.r_[0.0, equity[ends]]),
+            equity[ends],
+            drawdown[ends],
+            float(drawdown.max()),
+        )
@@ -1,32 +1,138 @@
+import asyncio
 import io
 import logging
 
+from datetime import datetime, timedelta
+
 import google.protobuf.timestamp_pb2 as timestampProtos
 import google.protobuf.wrappers_pb2 as wrappersProtos
 import numpy as np
 import MarketData_pb2 as protos
 import Contracts_pb2 as contractsProtos
 import MarketData_pb2_grpc as services
-import MetaTrader5 as mt5
+import pandas as pd
 import pytz
 
+from terminal.Extensions.Backend import mt5
+from terminal.Extensions.Continuation import Continuation
+from terminal.Extensions.Indicators import ATR, EMA, SMA, VWAP, Indicators
+from terminal.Extensions.MarketBook import MarketBook, MarketBookHub
 from terminal.Extensions.MT5Ext import MT5Ext
+from terminal.Extensions.Range import Range
+from terminal.Extensions.TickCodec import TickCodec
+from terminal.Extensions.TicksFilter import TicksFilter
+from terminal.Extensions.TimeBars import TimeBars
 
 logger = logging.getLogger("app")
 
 _MILLIS_PER_SECOND = 1000
 _NANOS_PER_MILLIS = 1000000
+_DEFAULT_POLL_INTERVAL = 1.0
+_DEFAULT_BOOK_POLL_INTERVAL = 0.1
+
+_INDICATORS = {
+    contractsProtos.INDICATOR_TYPE_SMA: SMA,
+    contractsProtos.INDICATOR_TYPE_EMA: EMA,
+    contractsProtos.INDICATOR_TYPE_ATR: ATR,
+    contractsProtos.INDICATOR_TYPE_VWAP: VWAP,
+}
 
 
 class MarketData(services.MarketDataServicer):
-    def __copyTicksRange(self, request):
-        return mt5.copy_ticks_range(
+    def __init__(self, book_poll_interval=_DEFAULT_BOOK_POLL_INTERVAL):
+        self.books = MarketBookHub(book_poll_interval)
+
+    def __copyTicksRange(self, request, timeMsc=0, offset=0):
+        fromDate = request.fromDate.ToDatetime(tzinfo=pytz.utc)
+
+        if timeMsc > 0:
+            # resuming, only the remaining sub-range is copied
+            fromDate = max(
+                fromDate,
+                datetime.fromtimestamp(timeMsc / _MILLIS_PER_SECOND, tz=pytz.utc),
+            )
+
+        data = mt5.copy_ticks_range(
             request.symbol.upper(),
-            request.fromDate.ToDatetime(tzinfo=pytz.utc),
+            fromDate,
             request.toDate.ToDatetime(tzinfo=pytz.utc),
             mt5.COPY_TICKS_ALL if request.type == 0 else request.type,
         )
 
+        if data is None:
+            return None, None
+
+        filter = request.filter if request.HasField("filter") else None
+
+        if filter is not None:
+            data = data[TicksFilter.mask(data, filter)]
+
+        offsets = Continuation.offsets(data["time_msc"])
+        begin = 0
+
+        if timeMsc > 0:
+            # dedupe and decimation restart at the last tick sent, which is dropped
+            begin = int(np.searchsorted(data["time_msc"], timeMsc, side="left"))
+            begin += max(offset - 1, 0)
+
+        index = np.arange(begin, len(data))
+
+        if filter is not None:
+            index = begin + TicksFilter.select(
+                data[begin:], filter, getattr(request, "returnFields", None)
+            )
+
+        if offset > 0 and len(index) > 0 and index[0] == begin:
+            index = index[1:]
+
+        return data[index], offsets[index]
+
+    def __invalidParams(self, error):
+        return contractsProtos.ResponseStatus(
+            responseCode=contractsProtos.RES_E_INVALID_PARAMS,
+            responseMessage=wrappersProtos.StringValue(value=str(error)),
+        )
+
+    def __checkFilter(self, request):
+        if not request.HasField("filter"):
+            return None
+
+        try:
+            TicksFilter.validate(request.filter)
+        except ValueError as error:
+            return self.__invalidParams(error)
+
+        return None
+
+    def __resume(self, request):
+        try:
+            return Continuation.resume(request), None
+        except ValueError as error:
+            return (0, 0), self.__invalidParams(error)
+
+    def __saveTicks(self, bytesIO, data, request):
+        returnFields = request.returnFields
+
+        if request.encoding == contractsProtos.TICKS_ENCODING_COMPACT:
+            symbolInfo = mt5.symbol_info(request.symbol.upper())
+            TickCodec.write(
+                bytesIO,
+                data[[field for field in data.dtype.names if field in returnFields]],
+                symbolInfo.trade_tick_size if symbolInfo is not None else 0.0,
+            )
+            return
+
+        np.savez_compressed(
+            bytesIO,
+            time_msc=data["time_msc"] if "time_msc" in returnFields else [],
+            bid=data["bid"] if "bid" in returnFields else [],
+            ask=data["ask"] if "ask" in returnFields else [],
+            last=data["last"] if "last" in returnFields else [],
+            volume=data["volume"] if "volume" in returnFields else [],
+            volume_real=(data["volume_real"] if "volume_real" in returnFields else []),
+            flags=data["flags"] if "flags" in returnFields else [],
+        )
+
     def __copyRatesRange(self, request):
         return mt5.copy_rates_range(
             request.symbol.upper(),
@@ -35,6 +141,7 @@ class MarketData(services.MarketDataServicer):
             request.toDate.ToDatetime(tzinfo=pytz.utc),
         )
 
+    @MT5Ext.fail_fast(protos.GetSymbolTickReply)
     def GetSymbolTick(self, request, _):
         tick = mt5.symbol_info_tick(request.symbol)
         responseStatus = MT5Ext.check_conn()
@@ -60,15 +167,34 @@ class MarketData(services.MarketDataServicer):
             responseStatus=responseStatus,
         )
 
+    @MT5Ext.fail_fast(protos.TicksRangeReply)
     def StreamTicksRange(self, request, _):
-        data = self.__copyTicksRange(request)
+        responseStatus = self.__checkFilter(request)
+
+        if responseStatus is not None:
+            yield protos.TicksRangeReply(responseStatus=responseStatus)
+            return
+
+        (timeMsc, offset), responseStatus = self.__resume(request)
+
+        if responseStatus is not None:
+            yield protos.TicksRangeReply(responseStatus=responseStatus)
+            return
+
+        data, offsets = self.__copyTicksRange(request, timeMsc, offset)
         responseStatus = MT5Ext.check_conn()
 
         if responseStatus.responseCode != contractsProtos.RES_S_OK:
             yield protos.TicksRangeReply(responseStatus=responseStatus)
+            return
 
         logger.debug("StreamTicksRange: %s", len(data))
 
+        ends = list(range(request.chunkSize, len(data), request.chunkSize)) + [len(data)]
+        positions = Continuation.positions(
+            data["time_msc"], offsets, [end - 1 for end in ends], timeMsc, offset
+        )
+
         ticks = [
             protos.Tick(
                 time=timestampProtos.Timestamp(
@@ -89,49 +215,73 @@ class MarketData(services.MarketDataServicer):
 
         del data
 
-        for i in range(0, len(ticks), request.chunkSize):
+        for i, position in zip(range(0, len(ticks), request.chunkSize), positions):
             chunk = ticks[i : i + request.chunkSize]
             logger.debug("reply %s trades", len(chunk))
             yield protos.TicksRangeReply(
                 ticks=chunk,
                 responseStatus=responseStatus,
+                continuationToken=Continuation.issue(request, *position),
             )
 
+    @MT5Ext.fail_fast(protos.TicksRangeBytesReply)
     def StreamTicksRangeBytes(self, request, _):
-        data = self.__copyTicksRange(request)
+        responseStatus = self.__checkFilter(request)
+
+        if responseStatus is not None:
+            yield protos.TicksRangeBytesReply(responseStatus=responseStatus)
+            return
+
+        (timeMsc, offset), responseStatus = self.__resume(request)
+
+        if responseStatus is not None:
+            yield protos.TicksRangeBytesReply(responseStatus=responseStatus)
+            return
+
+        data, offsets = self.__copyTicksRange(request, timeMsc, offset)
         responseStatus = MT5Ext.check_conn()
 
         if responseStatus.responseCode != contractsProtos.RES_S_OK:
             yield protos.TicksRangeBytesReply(responseStatus=responseStatus)
+            return
 
         logger.debug("StreamTicksRangeBytes: %s", len(data))
 
-        with io.BytesIO() as bytesIO:
-            np.savez_compressed(
-                bytesIO,
-                time_msc=data["time_msc"] if "time_msc" in request.returnFields else [],
-                bid=data["bid"] if "bid" in request.returnFields else [],
-                ask=data["ask"] if "ask" in request.returnFields else [],
-                last=data["last"] if "last" in request.returnFields else [],
-                volume=data["volume"] if "volume" in request.returnFields else [],
-                volume_real=(
-                    data["volume_real"] if "volume_real" in request.returnFields else []
-                ),
-                flags=data["flags"] if "flags" in request.returnFields else [],
-            )
-            bytesIO.flush()
-            bytesIO.seek(0)
-            chunk = bytesIO.read(request.chunkSize)
-            while len(chunk) > 0:
-                logger.debug("reply %s bytes", len(chunk))
-                yield protos.TicksRangeBytesReply(
-                    bytes=chunk,
-                    responseStatus=responseStatus,
-                )
-                chunk = bytesIO.read(request.chunkSize)
+        # every payload is a complete file, its last chunk carries the token to resume after it
+        ticksPerPayload = request.ticksPerPayload or max(len(data), 1)
+        ends = list(range(ticksPerPayload, len(data), ticksPerPayload)) + [len(data)]
+        positions = Continuation.positions(
+            data["time_msc"], offsets, [end - 1 for end in ends], timeMsc, offset
+        )
 
+        for start, end, position in zip([0] + ends[:-1], ends, positions):
+            with io.BytesIO() as bytesIO:
+                self.__saveTicks(bytesIO, data[start:end], request)
+                bytesIO.flush()
+                bytesIO.seek(0)
+                chunk = bytesIO.read(request.chunkSize)
+                while len(chunk) > 0:
+                    logger.debug("reply %s bytes", len(chunk))
+                    following = bytesIO.read(request.chunkSize)
+                    yield protos.TicksRangeBytesReply(
+                        bytes=chunk,
+                        responseStatus=responseStatus,
+                        continuationToken=(
+                            Continuation.issue(request, *position)
+                            if len(following) == 0
+                            else ""
+                        ),
+                    )
+                    chunk = following
+
+    @MT5Ext.fail_fast(protos.TicksRangeBytesReply)
     def GetTicksRangeBytes(self, request, _):
-        data = self.__copyTicksRange(request)
+        responseStatus = self.__checkFilter(request)
+
+        if responseStatus is not None:
+            return protos.TicksRangeBytesReply(responseStatus=responseStatus)
+
+        data, _ = self.__copyTicksRange(request)
         responseStatus = MT5Ext.check_conn()
 
         if responseStatus.responseCode != contractsProtos.RES_S_OK:
@@ -140,18 +290,7 @@ class MarketData(services.MarketDataServicer):
         logger.debug("GetTicksRangeBytes: %s", len(data))
 
         with io.BytesIO() as bytesIO:
-            np.savez_compressed(
-                bytesIO,
-                time_msc=data["time_msc"] if "time_msc" in request.returnFields else [],
-                bid=data["bid"] if "bid" in request.returnFields else [],
-                ask=data["ask"] if "ask" in request.returnFields else [],
-                last=data["last"] if "last" in request.returnFields else [],
-                volume=data["volume"] if "volume" in request.returnFields else [],
-                volume_real=(
-                    data["volume_real"] if "volume_real" in request.returnFields else []
-                ),
-                flags=data["flags"] if "flags" in request.returnFields else [],
-            )
+            self.__saveTicks(bytesIO, data, request)
             nbytes = bytesIO.tell()
             bytesIO.flush()
             bytesIO.seek(0)
@@ -161,12 +300,14 @@ class MarketData(services.MarketDataServicer):
                 responseStatus=responseStatus,
             )
 
+    @MT5Ext.fail_fast(protos.RatesRangeReply)
     def StreamRatesRange(self, request, _):
         data = self.__copyRatesRange(request)
         responseStatus = MT5Ext.check_conn()
 
         if responseStatus.responseCode != contractsProtos.RES_S_OK:
             yield protos.RatesRangeReply(responseStatus=responseStatus)
+            return
 
         rates = [
             protos.Rate(
@@ -184,14 +325,15 @@ class MarketData(services.MarketDataServicer):
 
         del data
 
-        for i in range(0, len(data), request.chunkSize):
+        for i in range(0, len(rates), request.chunkSize):
             yield protos.RatesRangeReply(
                 rates=rates[i : i + request.chunkSize],
                 responseStatus=responseStatus,
             )
 
+    @MT5Ext.fail_fast(protos.RatesRangeReply)
     def StreamRatesRangeFromTicks(self, request, _):
-        data = self.__copyTicksRange(
+        data, _ = self.__copyTicksRange(
             protos.StreamTicksRangeRequest(
                 symbol=request.symbol,
                 fromDate=request.fromDate,
@@ -203,6 +345,7 @@ class MarketData(services.MarketDataServicer):
 
         if responseStatus.responseCode != contractsProtos.RES_S_OK:
             yield protos.RatesRangeReply(responseStatus=responseStatus)
+            return
 
         ohlc = MT5Ext.create_ohlc_from_ticks(data, request.timeframe.ToTimedelta())
 
@@ -229,3 +372,205 @@ class MarketData(services.MarketDataServicer):
                 rates=rates[i : i + request.chunkSize],
                 responseStatus=responseStatus,
             )
+
+    def __copyTradesFrom(self, symbol, fromDate):
+        return mt5.copy_ticks_range(
+            symbol.upper(),
+            fromDate,
+            datetime.now(tz=pytz.utc) + timedelta(days=1),
+            mt5.COPY_TICKS_TRADE,
+        )
+
+    def __indicatorsReply(self, request, columns, values, responseStatus):
+        return protos.IndicatorsReply(
+            timeMsc=columns["time"].astype("datetime64[ms]").astype(np.int64).tolist(),
+            close=columns["close"].tolist(),
+            indicators=[
+                protos.IndicatorValues(indicator=spec, values=value.tolist())
+                for spec, value in zip(request.indicators, values)
+            ],
+            responseStatus=responseStatus,
+        )
+
+    def __invalidIndicators(self, request):
+        if len(request.indicators) == 0 or any(
+            spec.type not in _INDICATORS for spec in request.indicators
+        ):
+            return "unknown or missing indicator"
+
+        # vwap is anchored to the session and takes no period
+        if any(
+            spec.period < 0
+            or (spec.period == 0 and spec.type != contractsProtos.INDICATOR_TYPE_VWAP)
+            for spec in request.indicators
+        ):
+            return "indicator period must be positive"
+
+        if request.HasField("brickSize"):
+            if request.brickSize <= 0:
+                return "brickSize must be positive"
+        elif (
+            not request.HasField("timeframe")
+            or request.timeframe.ToTimedelta() <= timedelta(0)
+        ):
+            return "timeframe must be positive"
+
+        return None
+
+    def __indicatorsHistory(self, request):
+        data = self.__copyTradesFrom(
+            request.symbol, request.fromDate.ToDatetime(tzinfo=pytz.utc)
+        )
+        responseStatus = MT5Ext.check_conn()
+
+        if responseStatus.responseCode != contractsProtos.RES_S_OK:
+            return None, None, responseStatus
+
+        logger.debug("SubscribeIndicators: %s", len(data))
+
+        times = pd.to_datetime(data["time_msc"], unit="ms")
+
+        if request.HasField("brickSize"):
+            builder = Range(request.brickSize, times, data["last"], data["volume_real"])
+        else:
+            builder = TimeBars(
+                request.timeframe.ToTimedelta(),
+                times,
+                data["last"],
+                data["volume_real"],
+            )
+
+        _, timeMsc, offset = MT5Ext.ticks_after(data, 0, 0)
+
+        return builder, (timeMsc, offset), responseStatus
+
+    def __indicatorsUpdate(self, request, builder, timeMsc, offset):
+        data = self.__copyTradesFrom(
+            request.symbol,
+            datetime.fromtimestamp(timeMsc / _MILLIS_PER_SECOND, tz=pytz.utc)
+            if timeMsc > 0
+            else request.fromDate.ToDatetime(tzinfo=pytz.utc),
+        )
+        responseStatus = MT5Ext.check_conn()
+
+        if responseStatus.responseCode != contractsProtos.RES_S_OK:
+            return (timeMsc, offset), responseStatus
+
+        ticks, timeMsc, offset = MT5Ext.ticks_after(data, timeMsc, offset)
+
+        for tick in ticks:
+            builder.check_new_price(
+                pd.Timestamp(int(tick["time_msc"]), unit="ms"),
+                float(tick["last"]),
+                float(tick["volume_real"]),
+            )
+
+        return (timeMsc, offset), responseStatus
+
+    @MT5Ext.fail_fast(protos.IndicatorsReply)
+    async def SubscribeIndicators(self, request, context):
+        invalid = self.__invalidIndicators(request)
+
+        if invalid is not None:
+            yield protos.IndicatorsReply(
+                responseStatus=contractsProtos.ResponseStatus(
+                    responseCode=contractsProtos.RES_E_INVALID_PARAMS,
+                    responseMessage=wrappersProtos.StringValue(value=invalid),
+                )
+            )
+            return
+
+        indicators = [
+            _INDICATORS[spec.type](spec.period) for spec in request.indicators
+        ]
+
+        # terminal calls and bar building run in the executor
+        loop = asyncio.get_running_loop()
+
+        builder, position, responseStatus = await loop.run_in_executor(
+            None, self.__indicatorsHistory, request
+        )
+
+        if responseStatus.responseCode != contractsProtos.RES_S_OK:
+            yield protos.IndicatorsReply(responseStatus=responseStatus)
+            return
+
+        bars = builder.bricks if request.HasField("brickSize") else builder.bars
+        emitted = max(len(bars) - 1, 0)
+
+        if emitted > 0:
+            columns = Indicators.columns(bars[:emitted])
+            values = [indicator.batch(columns) for indicator in indicators]
+            for indicator in indicators:
+                indicator.seed(columns)
+            yield self.__indicatorsReply(request, columns, values, responseStatus)
+
+        pollInterval = (
+            request.pollInterval.ToTimedelta().total_seconds()
+            or _DEFAULT_POLL_INTERVAL
+        )
+
+        # cancelled by grpc when the client goes away
+        while True:
+            await asyncio.sleep(pollInterval)
+
+            position, responseStatus = await loop.run_in_executor(
+                None, self.__indicatorsUpdate, request, builder, *position
+            )
+
+            if responseStatus.responseCode != contractsProtos.RES_S_OK:
+                yield protos.IndicatorsReply(responseStatus=responseStatus)
+                continue
+
+            closed = bars[emitted:-1]
+
+            if len(closed) == 0:
+                continue
+
+            emitted += len(closed)
+            columns = Indicators.columns(closed)
+            values = [
+                np.array([indicator.update(bar) for bar in closed])
+                for indicator in indicators
+            ]
+            yield self.__indicatorsReply(request, columns, values, responseStatus)
+
+    def __marketBookReply(self, book, previous):
+        key = None if previous is None else previous.sequence
+        reply = book.replies.get(key)
+
+        if reply is None:
+            levels = book.levels if previous is None else MarketBook.delta(previous, book)
+            reply = book.replies[key] = protos.MarketBookReply(
+                timeMsc=book.time_msc,
+                sequence=book.sequence,
+                snapshot=previous is None,
+                type=levels["type"].tolist(),
+                price=levels["price"].tolist(),
+                volume=levels["volume"].tolist(),
+                responseStatus=contractsProtos.ResponseStatus(
+                    responseCode=contractsProtos.RES_S_OK,
+                    responseMessage=wrappersProtos.StringValue(value="Success"),
+                ),
+            )
+
+        return reply
+
+    @MT5Ext.fail_fast(protos.MarketBookReply)
+    async def SubscribeMarketBook(self, request, context):
+        previous = None
+
+        async for book in self.books.books(request.symbol.upper()):
+            if book.responseStatus is not None:
+                previous = None
+                yield protos.MarketBookReply(
+                    timeMsc=book.time_msc,
+                    sequence=book.sequence,
+                    responseStatus=book.responseStatus,
+                )
+                continue
+
+            yield self.__marketBookReply(book, previous)
+
+            if request.delta:
+                previous = book
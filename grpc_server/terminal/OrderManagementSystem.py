@@ -2,16 +2,19 @@ import logging
 
 import google.protobuf.timestamp_pb2 as timestampProtos
 import google.protobuf.wrappers_pb2 as wrappersProtos
-import MetaTrader5 as mt5
 import OrderManagementSystem_pb2 as protos
 import Contracts_pb2 as contractsProtos
 import OrderManagementSystem_pb2_grpc as services
 import pytz
 
+from terminal.Extensions.Backend import mt5
 from terminal.Extensions.MT5Ext import MT5Ext
+from terminal.Extensions.TradeAnalytics import TradeAnalytics
 
 logger = logging.getLogger("app")
 
+_MILLIS_PER_DAY = 24 * 60 * 60 * 1000
+
 
 class OrderManagementSystem(services.OrderManagementSystemServicer):
     def __parseOrders(self, result):
@@ -121,6 +124,7 @@ class OrderManagementSystem(services.OrderManagementSystemServicer):
 
         return orderRequest
 
+    @MT5Ext.fail_fast(protos.GetPositionsReply)
     def GetPositions(self, request, _):
         result = []
 
@@ -177,6 +181,7 @@ class OrderManagementSystem(services.OrderManagementSystemServicer):
             positions=positions, responseStatus=responseStatus
         )
 
+    @MT5Ext.fail_fast(protos.GetOrdersReply)
     def GetOrders(self, request, _):
         result = []
 
@@ -197,6 +202,7 @@ class OrderManagementSystem(services.OrderManagementSystemServicer):
             orders=self.__parseOrders(result), responseStatus=responseStatus
         )
 
+    @MT5Ext.fail_fast(protos.GetHistoryOrdersReply)
     def GetHistoryOrders(self, request, _):
         result = []
 
@@ -219,6 +225,7 @@ class OrderManagementSystem(services.OrderManagementSystemServicer):
             orders=self.__parseOrders(result), responseStatus=responseStatus
         )
 
+    @MT5Ext.fail_fast(protos.GetHistoryDealsReply)
     def GetHistoryDeals(self, request, _):
         result = []
 
@@ -269,6 +276,54 @@ class OrderManagementSystem(services.OrderManagementSystemServicer):
 
         return protos.GetHistoryDealsReply(deals=deals, responseStatus=responseStatus)
 
+    def __dealsStats(self, stats):
+        return protos.DealsStats(
+            **{name: values.tolist() for name, values in stats.items()}
+        )
+
+    @MT5Ext.fail_fast(protos.GetTradeAnalyticsReply)
+    def GetTradeAnalytics(self, request, _):
+        args = [
+            request.fromDate.ToDatetime(tzinfo=pytz.utc),
+            request.toDate.ToDatetime(tzinfo=pytz.utc),
+        ]
+        result = (
+            mt5.history_deals_get(*args, group=request.group)
+            if request.group
+            else mt5.history_deals_get(*args)
+        )
+
+        responseStatus = MT5Ext.check_conn()
+        if responseStatus.responseCode != contractsProtos.RES_S_OK:
+            return protos.GetTradeAnalyticsReply(responseStatus=responseStatus)
+
+        deals, trade = TradeAnalytics.trading(TradeAnalytics.deals(result))
+        logger.debug("GetTradeAnalytics: %s deals", len(deals))
+
+        bucket = int(request.bucket.ToMilliseconds()) or _MILLIS_PER_DAY
+        timeMsc, pnl, equity, drawdown, maxDrawdown = TradeAnalytics.equity(
+            deals, bucket
+        )
+        magic, byMagic = TradeAnalytics.breakdown(deals, trade, "magic")
+        symbol, bySymbol = TradeAnalytics.breakdown(deals, trade, "symbol")
+
+        return protos.GetTradeAnalyticsReply(
+            total=self.__dealsStats(TradeAnalytics.stats(deals, trade)),
+            equityCurve=protos.EquityCurve(
+                timeMsc=timeMsc.tolist(),
+                pnl=pnl.tolist(),
+                equity=equity.tolist(),
+                drawdown=drawdown.tolist(),
+            ),
+            maxDrawdown=maxDrawdown,
+            magic=magic.tolist(),
+            byMagic=self.__dealsStats(byMagic),
+            symbol=symbol.tolist(),
+            bySymbol=self.__dealsStats(bySymbol),
+            responseStatus=responseStatus,
+        )
+
+    @MT5Ext.fail_fast(protos.CheckOrderReply)
     def CheckOrder(self, request, _):
         orderRequest = self.__orderRequest(request)
         result = mt5.order_check(orderRequest)
@@ -289,6 +344,7 @@ class OrderManagementSystem(services.OrderManagementSystemServicer):
             responseStatus=responseStatus,
         )
 
+    @MT5Ext.fail_fast(protos.SendOrderReply)
     def SendOrder(self, request, _):
         orderRequest = self.__orderRequest(request)
         logger.debug("SendOrder Request: %s", orderRequest)
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_PROTOS = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "protos"))
+
+
+@pytest.fixture(scope="session")
+def protos(tmp_path_factory):
+    # same as codegen.bat, for tests that drive the servicers
+    protoc = pytest.importorskip("grpc_tools.protoc")
+    include = os.path.join(os.path.dirname(protoc.__file__), "_proto")
+    codegen = str(tmp_path_factory.mktemp("codegen"))
+    for name in ["Contracts", "MarketData", "OrderManagementSystem", "Admin"]:
+        assert (
+            protoc.main(
+                [
+                    "protoc",
+                    f"-I{_PROTOS}",
+                    f"-I{include}",
+                    f"--python_out={codegen}",
+                    f"--grpc_python_out={codegen}",
+                    os.path.join(_PROTOS, f"{name}.proto"),
+                ]
+            )
+            == 0
+        )
+    sys.path.insert(0, codegen)
+    yield codegen
+    sys.path.remove(codegen)
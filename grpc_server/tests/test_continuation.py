@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from terminal.Extensions.Backend import Backend
+from terminal.Extensions.Replay import TICK_DTYPE, Replay
+
+SYMBOL = "WINQ24"
+
+
+def ticks(count, seed=7):
+    # few distinct milliseconds and prices, so tokens land inside bursts and repeats
+    rng = np.random.default_rng(seed)
+    time_msc = 1717416000000 + np.cumsum(rng.choice([0, 0, 0, 1, 3], count))
+    last = 130000 + 5 * np.cumsum(rng.choice([-1, 0, 0, 0, 1], count))
+
+    ticks = np.zeros(count, dtype=TICK_DTYPE)
+    ticks["time_msc"] = time_msc
+    ticks["time"] = time_msc // 1000
+    ticks["last"] = last
+    ticks["bid"] = last - 5
+    ticks["ask"] = last + 5
+    ticks["volume"] = rng.integers(1, 20, count)
+    ticks["volume_real"] = ticks["volume"]
+    ticks["flags"] = rng.choice(
+        [
+            Replay.TICK_FLAG_LAST | Replay.TICK_FLAG_VOLUME,
+            Replay.TICK_FLAG_BID | Replay.TICK_FLAG_ASK,
+        ],
+        count,
+    )
+    return ticks
+
+
+@pytest.fixture(scope="module")
+def servicer(protos):
+    from terminal.MarketData import MarketData
+
+    replay = Replay({SYMBOL: ticks(3000)}, speed=0)
+    Backend.use(replay)
+    replay.initialize()
+    yield MarketData()
+    replay.shutdown()
+    Backend.use(None)
+
+
+def request(**filter):
+    import MarketData_pb2 as protos
+    import google.protobuf.wrappers_pb2 as wrappersProtos
+
+    if "minVolume" in filter:
+        filter["minVolume"] = wrappersProtos.DoubleValue(value=filter["minVolume"])
+
+    request = protos.StreamTicksRangeRequest(symbol=SYMBOL, chunkSize=7)
+    request.fromDate.FromMilliseconds(1717416000000)
+    request.toDate.FromMilliseconds(1717416000000 + 86400000)
+    request.filter.CopyFrom(protos.TicksFilter(**filter))
+    return request
+
+
+def stream(servicer, request):
+    import Contracts_pb2 as contractsProtos
+
+    replies = list(servicer.StreamTicksRange(request, None))
+    for reply in replies:
+        assert reply.responseStatus.responseCode == contractsProtos.RES_S_OK
+    return replies
+
+
+def flatten(replies):
+    return [tick.SerializeToString() for reply in replies for tick in reply.ticks]
+
+
+@pytest.mark.parametrize(
+    "filter",
+    [
+        {},
+        {"flagsMask": Replay.TICK_FLAG_LAST},
+        {"minVolume": 10},
+        {"dedupeQuotes": True},
+        {"everyNth": 3},
+        {"lastPerMs": 2},
+        {"flagsMask": Replay.TICK_FLAG_LAST, "dedupeQuotes": True, "everyNth": 4},
+        {"dedupeQuotes": True, "lastPerMs": 5},
+    ],
+)
+def test_resume_from_every_token(servicer, filter):
+    full = stream(servicer, request(**filter))
+    expected = flatten(full)
+    assert len(full) > 10
+
+    for i, reply in enumerate(full):
+        resumed = request(**filter)
+        resumed.continuationToken = reply.continuationToken
+        resumed.chunkSize = 5
+        assert flatten(full[: i + 1]) + flatten(stream(servicer, resumed)) == expected
+
+
+def test_token_for_another_request(servicer):
+    import Contracts_pb2 as contractsProtos
+
+    token = stream(servicer, request(everyNth=3))[0].continuationToken
+    resumed = request(everyNth=4)
+    resumed.continuationToken = token
+    (reply,) = servicer.StreamTicksRange(resumed, None)
+    assert reply.responseStatus.responseCode == contractsProtos.RES_E_INVALID_PARAMS
+    assert not reply.ticks
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from terminal.Extensions.Indicators import ATR, EMA, SMA, VWAP, Indicators
+
+PERIOD = 14
+
+
+@pytest.fixture
+def bars():
+    # one minute bars over two sessions
+    rng = np.random.default_rng(7)
+    index = pd.date_range("2024-06-19 12:00", periods=300, freq="1min").append(
+        pd.date_range("2024-06-20 12:00", periods=300, freq="1min")
+    )
+    close = 130000 + np.cumsum(rng.normal(0, 25, len(index)))
+    opens = np.r_[close[0], close[:-1]]
+    spread = rng.uniform(0, 40, (2, len(index)))
+    return pd.DataFrame(
+        {
+            "open": opens,
+            "high": np.maximum(opens, close) + spread[0],
+            "low": np.minimum(opens, close) - spread[1],
+            "close": close,
+            "real_volume": rng.integers(1, 500, len(index)).astype(np.float64),
+        },
+        index=index,
+    )
+
+
+def sma(bars):
+    return bars["close"].rolling(PERIOD).mean().to_numpy()
+
+
+def ema(bars):
+    return (
+        bars["close"]
+        .ewm(span=PERIOD, adjust=False, min_periods=PERIOD)
+        .mean()
+        .to_numpy()
+    )
+
+
+def atr(bars):
+    previous = bars["close"].shift()
+    tr = pd.concat(
+        [
+            bars["high"] - bars["low"],
+            (bars["high"] - previous).abs(),
+            (bars["low"] - previous).abs(),
+        ],
+        axis=1,
+    ).max(axis=1)
+
+    # wilder smoothing seeded with the simple mean of the first period
+    seeded = tr.copy()
+    seeded.iloc[:PERIOD] = np.nan
+    seeded.iloc[PERIOD - 1] = tr.rolling(PERIOD).mean().iloc[PERIOD - 1]
+    return (
+        seeded.ewm(alpha=1.0 / PERIOD, adjust=False, ignore_na=True).mean().to_numpy()
+    )
+
+
+def vwap(bars):
+    typical = (bars["high"] + bars["low"] + bars["close"]) / 3
+    sessions = bars.index.normalize()
+    pv = (typical * bars["real_volume"]).groupby(sessions).cumsum()
+    volume = bars["real_volume"].groupby(sessions).cumsum()
+    return (pv / volume).to_numpy()
+
+
+CASES = [
+    (SMA, PERIOD, sma),
+    (EMA, PERIOD, ema),
+    (ATR, PERIOD, atr),
+    (VWAP, 0, vwap),
+]
+
+
+def records(bars):
+    columns = Indicators.columns(bars)
+    return [
+        {name: values[i] for name, values in columns.items()}
+        for i in range(len(bars))
+    ]
+
+
+@pytest.mark.parametrize("indicator, period, expected", CASES)
+def test_batch(bars, indicator, period, expected):
+    (values,) = Indicators.batch(bars, [indicator(period)])
+
+    np.testing.assert_allclose(values, expected(bars), rtol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("indicator, period, expected", CASES)
+def test_update(bars, indicator, period, expected):
+    instance = indicator(period)
+    values = [instance.update(bar) for bar in records(bars)]
+
+    np.testing.assert_allclose(values, expected(bars), rtol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("seeded", [5, PERIOD, 350])
+@pytest.mark.parametrize("indicator, period, expected", CASES)
+def test_seed(bars, indicator, period, expected, seeded):
+    instance = indicator(period)
+    instance.seed(Indicators.columns(bars.iloc[:seeded]))
+    values = [instance.update(bar) for bar in records(bars)[seeded:]]
+
+    np.testing.assert_allclose(
+        values, expected(bars)[seeded:], rtol=1e-9, equal_nan=True
+    )
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pytest
+
+from terminal.Extensions.Replay import TICK_DTYPE
+from terminal.Extensions.TickCodec import TickCodec
+
+
+def ticks(count, tick_size, seed=7):
+    rng = np.random.default_rng(seed)
+    time_msc = 1717416000000 + np.cumsum(rng.integers(0, 500, count))
+    steps = 26000 + np.cumsum(rng.integers(-3, 4, count))
+
+    ticks = np.zeros(count, dtype=TICK_DTYPE)
+    ticks["time_msc"] = time_msc
+    ticks["time"] = time_msc // 1000
+    ticks["last"] = (
+        steps * tick_size if tick_size >= 1 else steps / round(1 / tick_size)
+    )
+    ticks["bid"] = ticks["last"] - tick_size
+    ticks["ask"] = ticks["last"] + tick_size
+    ticks["volume"] = rng.integers(1, 50, count)
+    ticks["volume_real"] = ticks["volume"]
+    ticks["flags"] = rng.choice([6, 24, 56, 88], count)
+    return ticks
+
+
+def assert_exact(expected, tick_size):
+    for decoded in [
+        TickCodec.decode(TickCodec.encode(expected, tick_size)),
+        TickCodec.loads(TickCodec.dumps(expected, tick_size)),
+    ]:
+        assert decoded.dtype == expected.dtype
+        assert decoded.tobytes() == expected.tobytes()
+
+
+def encodings(arrays):
+    header = json.loads(bytes(arrays["__meta__"]).decode())
+    return {field["name"]: field["encoding"] for field in header["fields"]}
+
+
+@pytest.mark.parametrize("tick_size", [5.0, 1.0, 0.5, 0.25, 0.01, 0.00001])
+def test_tick_sizes(tick_size):
+    expected = ticks(5000, tick_size)
+    arrays = TickCodec.encode(expected, tick_size)
+
+    assert encodings(arrays)["last"] == "ticks"
+    assert arrays["last"].dtype.itemsize == 1
+    assert_exact(expected, tick_size)
+
+
+@pytest.mark.parametrize("tick_size", [0.0, 0.01])
+def test_without_tick_size(tick_size):
+    # prices off the tick grid are stored raw
+    expected = ticks(1000, 0.01)
+    expected["bid"] += 0.003
+    assert_exact(expected, 0.0)
+    assert_exact(expected, tick_size)
+
+
+def test_nan_fields():
+    expected = ticks(1000, 5.0)
+    expected["last"][::3] = np.nan
+    expected["volume_real"][::7] = np.nan
+    assert_exact(expected, 5.0)
+
+
+@pytest.mark.parametrize("count", [0, 1])
+@pytest.mark.parametrize("tick_size", [0.0, 0.01, 5.0])
+def test_empty_and_single(count, tick_size):
+    assert_exact(ticks(count, tick_size or 1.0), tick_size)
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        ["time_msc", "bid", "ask"],
+        ["time_msc", "last", "volume_real"],
+        ["time", "last"],
+        ["time", "time_msc", "flags"],
+        ["last"],
+    ],
+)
+def test_field_subsets(fields):
+    full = ticks(1000, 5.0)
+    expected = np.zeros(len(full), dtype=[(name, full.dtype[name]) for name in fields])
+    for name in fields:
+        expected[name] = full[name]
+    assert_exact(expected, 5.0)
+
+
+def test_time_not_derived_from_time_msc():
+    expected = ticks(100, 5.0)
+    expected["time"][10] += 1
+    assert_exact(expected, 5.0)